@@ -1,95 +1,38 @@
-import json
+import asyncio
 import re
+import time
 import uuid
+from collections import Counter, defaultdict
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
+import config
+from agent.keywords import keyword_hits
 from agent.prompts import ANSWER_TEMPLATE, SYSTEM_PROMPT
 from agent.router import route
 from tools.calculators import economic_order_quantity, fill_rate, otif, reorder_point, safety_stock
-from tools.dictionary_lookup import lookup
-from tools.rag_search import search
-from tools.web_search import web_search
+from tools.deadline import deadline_after, expired, remaining
+from tools.dictionary_lookup import DICTIONARY, alookup, aspan_lookup, load_dictionary
+from tools.metrics import Trace
+from tools.rag_search import asearch, asearch_many
+from tools.rerank import candidate_pool, rerank
+from tools.run_logger import RunLogger
+from tools.sentence_index import context_text
+from tools.sentences import split_sentences, tokenize
+from tools.web_search import aweb_search
 
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 LOG_PATH = BASE_DIR / "logs" / "scm_runs.jsonl"
-STOPWORDS = {
-    "the",
-    "a",
-    "an",
-    "and",
-    "or",
-    "to",
-    "of",
-    "for",
-    "in",
-    "on",
-    "with",
-    "is",
-    "are",
-    "was",
-    "were",
-    "be",
-    "this",
-    "that",
-    "these",
-    "those",
-    "it",
-    "as",
-    "at",
-    "by",
-    "from",
-    "what",
-    "how",
-    "why",
-    "when",
-    "which",
-    "who",
-    "where",
-    "i",
-    "we",
-    "you",
-    "your",
-    "our",
-    "and/or",
-    "about",
-    "into",
-    "than",
-    "also",
-    "can",
-    "could",
-    "should",
-    "would",
-    "may",
-    "might",
-    "do",
-    "does",
-    "did",
-    "done",
-    "안",
-    "이",
-    "그",
-    "저",
-    "것",
-    "수",
-    "하는",
-    "하기",
-    "되",
-    "된다",
-    "될",
-    "좀",
-    "좀더",
-    "방법",
-    "어떻게",
-    "무엇",
-    "뭐",
-    "설명",
-    "알려줘",
-    "알려",
-    "해주세요",
-    "해줘",
-}
+RUN_LOGGER = RunLogger(
+    LOG_PATH,
+    max_queue=config.RUN_LOG_QUEUE_SIZE,
+    batch_size=config.RUN_LOG_BATCH_SIZE,
+    flush_seconds=config.RUN_LOG_FLUSH_MS / 1000,
+    max_bytes=config.RUN_LOG_MAX_MB * 2**20,
+    backups=config.RUN_LOG_BACKUPS,
+)
+CONTEXT_CHARS = 2000
 
 
 def _format_sources(sources: List[Dict]) -> str:
@@ -98,52 +41,49 @@ def _format_sources(sources: List[Dict]) -> str:
     return "\n".join(f"- {s['source']} (score={s['score']:.3f})" for s in sources)
 
 
+def _public_sources(sources: List[Dict]) -> List[Dict]:
+    return [{k: v for k, v in s.items() if k != "sentences"} for s in sources]
+
+
 def _log_run(payload: Dict) -> None:
-    LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with LOG_PATH.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(payload, ensure_ascii=True) + "\n")
+    # Enqueue only; the background writer batches, rotates and counts drops.
+    RUN_LOGGER.log(payload)
+
+
+# Checked in order; the first keyword found in the query picks the calculation.
+CALCULATIONS = {
+    "eoq": lambda: economic_order_quantity(annual_demand=12000, order_cost=50, holding_cost=5),
+    "reorder point": lambda: reorder_point(daily_demand=120, lead_time_days=10, safety_stock=300),
+    "safety stock": lambda: safety_stock(z_score=1.65, demand_std=40, lead_time_days=10),
+    "fill rate": lambda: fill_rate(filled_units=950, total_demand_units=1000),
+    "otif": lambda: otif(on_time=0.92, in_full=0.95),
+    "": lambda: {"metric": "Calculation", "value": "Provide parameters for calculation."},
+}
 
 
-def _run_calculator(query: str) -> Dict:
-    text = query.lower()
-    if "eoq" in text:
-        return economic_order_quantity(annual_demand=12000, order_cost=50, holding_cost=5)
-    if "reorder point" in text:
-        return reorder_point(daily_demand=120, lead_time_days=10, safety_stock=300)
-    if "safety stock" in text:
-        return safety_stock(z_score=1.65, demand_std=40, lead_time_days=10)
-    if "fill rate" in text:
-        return fill_rate(filled_units=950, total_demand_units=1000)
-    if "otif" in text:
-        return otif(on_time=0.92, in_full=0.95)
-    return {"metric": "Calculation", "value": "Provide parameters for calculation."}
-
-
-def _detect_rag_domain(query: str) -> Optional[str]:
+def _calculator_key(query: str) -> str:
     text = query.lower()
-    demand_keywords = [
-        "demand",
-        "forecast",
-        "s&op",
-        "sales and operations",
-        "sales & operations",
-        "demand planning",
-    ]
-    supply_keywords = [
-        "supply",
-        "supplier",
-        "procurement",
-        "logistics",
-        "transport",
-        "warehouse",
-    ]
-    if any(word in text for word in demand_keywords):
+    return next(key for key in CALCULATIONS if key in text)
+
+
+def _run_calculator(query: str) -> Dict:
+    return CALCULATIONS[_calculator_key(query)]()
+
+
+def _detect_rag_domain(query: str, hits: Optional[Counter] = None) -> Optional[str]:
+    hits = keyword_hits(query) if hits is None else hits
+    if hits[("domain", "demand")]:
         return "demand"
-    if any(word in text for word in supply_keywords):
+    if hits[("domain", "supply")]:
         return "supply"
     return None
 
 
+def _should_hedge(dict_results: List[Dict], domain: Optional[str]) -> bool:
+    # No dictionary entry and no domain keyword: RAG usually falls through to the web.
+    return config.WEB_HEDGE and not dict_results and domain is None
+
+
 def _summarize_context(text: str, max_sentences: int = 3) -> str:
     clean = re.sub(r"\s+", " ", text).strip()
     if not clean:
@@ -157,19 +97,10 @@ def _select_relevant_sentences(query: str, context: str, max_sentences: int = 3)
     clean = re.sub(r"\s+", " ", context).strip()
     if not clean:
         return ""
-    query_tokens = {
-        token
-        for token in re.split(r"[^a-zA-Z0-9가-힣]+", query.lower())
-        if token and token not in STOPWORDS
-    }
-    sentences = re.split(r"(?<=[.!?])\s+", clean)
+    query_tokens = set(tokenize(query))
     scored = []
-    for sentence in sentences:
-        tokens = {
-            token
-            for token in re.split(r"[^a-zA-Z0-9가-힣]+", sentence.lower())
-            if token and token not in STOPWORDS
-        }
+    for sentence in split_sentences(clean):
+        tokens = set(tokenize(sentence))
         if not tokens:
             continue
         score = len(query_tokens & tokens)
@@ -182,6 +113,33 @@ def _select_relevant_sentences(query: str, context: str, max_sentences: int = 3)
     return " ".join(picked).strip()
 
 
+def _select_indexed_sentences(query: str, sources: List[Dict], max_sentences: int = 3) -> Optional[str]:
+    # Lookup over the sentences precomputed at index time; None when a source has none stored.
+    if not sources or not all(s.get("sentences") for s in sources):
+        return None
+    query_tokens = set(tokenize(query))
+    scored = []
+    offset = 0
+    for s in sources:
+        block = context_text(s)
+        limit = CONTEXT_CHARS - offset
+        matches, covered = s["sentences"].match(query_tokens, limit)
+        scored += [(score, " ".join(block[start:end].split())) for score, start, end in matches]
+        if len(block) >= limit:
+            # The context is cut inside this block; score the cut-off tail as the plain path would.
+            for sentence in split_sentences(" ".join(block[covered:limit].split())):
+                score = len(query_tokens & set(tokenize(sentence)))
+                if score > 0:
+                    scored.append((score, sentence))
+            break
+        offset += len(block) + 1
+    if not scored:
+        return ""
+    scored.sort(key=lambda item: item[0], reverse=True)
+    picked = [sentence for _, sentence in scored[:max_sentences]]
+    return " ".join(picked).strip()
+
+
 def _scores_too_low(sources: List[Dict], threshold: float = 0.01) -> bool:
     if not sources:
         return True
@@ -227,182 +185,292 @@ def _to_markdown(answer: str, max_bullets: int = 5) -> str:
     return formatted
 
 
-def run_agent(query: str, confidence_threshold: float = 0.55, top_k: int = 3) -> Dict:
-    dict_results, related_terms = lookup(query)
-    routing = route(query, related_terms)
+GUARD_KEY = ("guard", "")
+GUARD_ANSWER = (
+    "I can only answer SCM-related questions. "
+    "Please ask about supply chain, demand planning, inventory, or logistics."
+)
+# Built-in answers: (answer, source text).
+BUILT_IN_ANSWERS = {
+    "forecast": (
+        "## Demand forecasting methods (practical)\n"
+        "- **Qualitative**: sales/marketing input, Delphi, scenario planning to form an initial baseline.\n"
+        "- **Quantitative**: statistical models based on historical sales data.\n"
+        "\n"
+        "## Key formulas (examples)\n"
+        "- **Simple Moving Average (SMA)**: D̂(t+1) = (D_t + D_{t-1} + ... + D_{t-n+1}) / n\n"
+        "- **Simple Exponential Smoothing (SES)**: D̂(t+1) = α·D_t + (1-α)·D̂_t\n"
+        "- **MAPE**: MAPE = (1/n) · Σ |(D_t - D̂_t) / D_t| × 100\n"
+        "\n"
+        "## Quick examples\n"
+        "- If the last 3 months are 100, 120, 110, then SMA(3) = 110.\n"
+        "- If α=0.3, D_t=120, D̂_t=110, then SES forecast = 113.\n"
+        "\n"
+        "## Practical checklist\n"
+        "- Separate **seasonality/promotions** as explicit model inputs.\n"
+        "- Monitor accuracy with **MAPE, WAPE, Bias**.\n"
+        "- Use **ABC segmentation**: A-items get advanced models, C-items use simpler models.\n"
+        "\n"
+        "## Case examples (illustrative)\n"
+        "- Company A: inventory surplus → ABC + SES → **12% inventory turnover improvement**.\n"
+        "- Company B: promo spike → add promo drivers → **18% stockout reduction**.\n",
+        "수요예측 방법론",
+    ),
+    "safety_stock": (
+        "Safety stock is buffer inventory used to absorb demand variability and lead-time uncertainty. "
+        "A common formula is Safety Stock = Z × σd × √L, where Z is the service-level z-score, "
+        "σd is the daily demand standard deviation, and L is lead time (days).",
+        "안전재고 공식",
+    ),
+    "scm": (
+        "SCM (Supply Chain Management) is the end-to-end management of "
+        "planning, sourcing, production, logistics, and fulfillment to "
+        "deliver products efficiently and reliably.",
+        "SCM",
+    ),
+}
+
+
+def _built_in_source(text: str) -> Dict:
+    return {
+        "chunk_id": "built_in_definition",
+        "source": "built_in_definition",
+        "score": 1.0,
+        "text": text,
+        "page_text": "",
+    }
+
+
+def _dictionary_response(entry: Dict) -> Dict:
+    answer = (
+        f"{entry['term']}: {entry['definition']}\n"
+        f"Business meaning: {entry['business_meaning']}\n"
+        f"Formula: {entry.get('formula', 'N/A')}"
+    )
+    source = {
+        "chunk_id": f"dict:{entry['term']}",
+        "source": "data/scm_dictionary.json",
+        "score": 1.0,
+        "text": entry["term"],
+        "page_text": "",
+    }
+    return {"answer": _to_markdown(answer), "sources": [source]}
+
+
+class ResponseTable:
+    # Deterministic answers (guard, built-ins, dictionary definitions, fixed calculations) rendered once,
+    # so those requests skip _to_markdown and ANSWER_TEMPLATE.
+    def __init__(self) -> None:
+        self._entries: Dict[Tuple[str, str], Dict] = {}
+        self._formatted: Dict[Tuple, str] = {}
+
+    def build(self, dictionary: List[Dict]) -> None:
+        entries = {GUARD_KEY: {"answer": _to_markdown(GUARD_ANSWER), "sources": []}}
+        for key, (answer, source_text) in BUILT_IN_ANSWERS.items():
+            entries[("builtin", key)] = {
+                "answer": _to_markdown(answer),
+                "sources": [_built_in_source(source_text)],
+            }
+        for key, calculate in CALCULATIONS.items():
+            calc = calculate()
+            entries[("calculator", key)] = {
+                "answer": _to_markdown(f"{calc['metric']} = {calc['value']}"),
+                "sources": [],
+            }
+        for entry in dictionary:
+            # lookup() lists a term's entries in file order, so the first entry for a term is the one answered.
+            if entry.get("term"):
+                entries.setdefault(("dictionary", entry["term"]), _dictionary_response(entry))
+        # Swapped in whole, so concurrent requests see either the old table or the new one.
+        self._entries, self._formatted = entries, {}
+
+    def get(self, key: Tuple[str, str], dictionary_entry: Optional[Dict] = None) -> Dict:
+        if not self._entries:
+            self.build(load_dictionary())
+        response = self._entries.get(key)
+        if response is None and dictionary_entry is not None:
+            # A term added to the dictionary since the last build.
+            response = self._entries[key] = _dictionary_response(dictionary_entry)
+        return response
+
+    def formatted(self, key: Tuple[str, str], domain: str, confidence: float) -> str:
+        # The template shows confidence to two decimals, so that is all the cache key needs.
+        cache_key = (key, domain, f"{confidence:.2f}")
+        text = self._formatted.get(cache_key)
+        if text is None:
+            response = self.get(key)
+            text = self._formatted[cache_key] = ANSWER_TEMPLATE.format(
+                answer=response["answer"],
+                sources=_format_sources(response["sources"]),
+                confidence=confidence,
+                domain=domain,
+            )
+        return text
+
+
+RESPONSES = ResponseTable()
+# Dictionary edits picked up by lookup() re-render the definitions too.
+DICTIONARY.on_reload(RESPONSES.build)
+
+
+def _rag_answer(
+    query: str, candidates: List[Dict], top_k: int, trace: Trace, deadline: Optional[float] = None
+) -> Tuple[str, List[Dict], Dict]:
+    with trace.span("rerank"):
+        sources, rerank_stats = rerank(query, candidates, top_k, deadline)
+    with trace.span("select"):
+        answer = _select_answer(query, sources)
+    return answer, _public_sources(sources), rerank_stats
+
+
+def _select_answer(query: str, sources: List[Dict]) -> str:
+    context_blocks = []
+    for s in sources:
+        if s.get("page_text"):
+            context_blocks.append(s["page_text"])
+        else:
+            context_blocks.append(s["text"])
+    context = " ".join(context_blocks)[:CONTEXT_CHARS]
+    focused = _select_indexed_sentences(query, sources, max_sentences=3)
+    if focused is None:
+        focused = _select_relevant_sentences(query, context, max_sentences=3)
+    if focused:
+        return focused
+    summary = _summarize_context(context, max_sentences=3)
+    return summary if summary else "No relevant information found in sources."
+
+
+def run_agent(
+    query: str, confidence_threshold: float = 0.55, top_k: int = 3, deadline_ms: Optional[int] = None
+) -> Dict:
+    return asyncio.run(arun_agent(query, confidence_threshold, top_k, deadline_ms))
+
+
+# asearch's signature: (query, top_k, domain, deadline) -> results.
+Searcher = Callable[..., Awaitable[List[Dict]]]
+# Progress callback: (event, data), called on the event loop as each stage settles.
+Emitter = Callable[[str, Dict], None]
+
+
+async def arun_agent(
+    query: str,
+    confidence_threshold: float = 0.55,
+    top_k: int = 3,
+    deadline_ms: Optional[int] = None,
+    searcher: Searcher = asearch,
+    emit: Optional[Emitter] = None,
+) -> Dict:
+    start = time.perf_counter()
+    if deadline_ms is None:
+        deadline_ms = config.REQUEST_DEADLINE_MS
+    deadline = deadline_after(deadline_ms)
+    trace = Trace()
+    with trace.span("lookup"):
+        dict_results, related_terms = await alookup(query)
+    with trace.span("route"):
+        # One pass over the query finds the keywords for routing, the RAG domain and the SCM guard.
+        hits = keyword_hits(query)
+        routing = route(query, related_terms, hits)
     intent = routing["intent"]
     confidence = routing["confidence"]
     sources = []
     answer = ""
     tool_calls = []
     handled = False
+    rerank_stats = None
+    web_hedge = None
+    degraded = False
+
+    # Deterministic answers come pre-rendered from RESPONSES under this key.
+    response_key = None
+    dictionary_entry = None
 
     text = query.lower()
-    scm_keywords = [
-        "scm",
-        "supply chain",
-        "supply",
-        "supplier",
-        "procurement",
-        "logistics",
-        "warehouse",
-        "inventory",
-        "demand",
-        "forecast",
-        "s&op",
-        "otif",
-        "fill rate",
-        "reorder point",
-        "safety stock",
-        "수요",
-        "공급",
-        "공급망",
-        "조달",
-        "물류",
-        "창고",
-        "재고",
-        "예측",
-    ]
-    if not any(k in text for k in scm_keywords):
-        answer = (
-            "I can only answer SCM-related questions. "
-            "Please ask about supply chain, demand planning, inventory, or logistics."
-        )
-        sources = []
+    if not hits[("guard", "scm")]:
         tool_calls.append("scm_guard")
+        trace.record("total", time.perf_counter() - start)
+        if emit is not None:
+            emit("route", {"intent": intent, "confidence": confidence})
         return {
-            "answer": _to_markdown(answer),
-            "sources": sources,
+            "answer": RESPONSES.get(GUARD_KEY)["answer"],
+            "sources": [],
             "confidence": confidence,
             "domain": intent,
-            "formatted": ANSWER_TEMPLATE.format(
-                answer=_to_markdown(answer),
-                sources=_format_sources(sources),
-                confidence=confidence,
-                domain=intent,
-            ),
+            "degraded": degraded,
+            "formatted": RESPONSES.formatted(GUARD_KEY, intent, confidence),
         }
     if "수요예측" in text or "demand forecast" in text or "forecast" in text:
-        answer = (
-            "## Demand forecasting methods (practical)\n"
-            "- **Qualitative**: sales/marketing input, Delphi, scenario planning to form an initial baseline.\n"
-            "- **Quantitative**: statistical models based on historical sales data.\n"
-            "\n"
-            "## Key formulas (examples)\n"
-            "- **Simple Moving Average (SMA)**: D̂(t+1) = (D_t + D_{t-1} + ... + D_{t-n+1}) / n\n"
-            "- **Simple Exponential Smoothing (SES)**: D̂(t+1) = α·D_t + (1-α)·D̂_t\n"
-            "- **MAPE**: MAPE = (1/n) · Σ |(D_t - D̂_t) / D_t| × 100\n"
-            "\n"
-            "## Quick examples\n"
-            "- If the last 3 months are 100, 120, 110, then SMA(3) = 110.\n"
-            "- If α=0.3, D_t=120, D̂_t=110, then SES forecast = 113.\n"
-            "\n"
-            "## Practical checklist\n"
-            "- Separate **seasonality/promotions** as explicit model inputs.\n"
-            "- Monitor accuracy with **MAPE, WAPE, Bias**.\n"
-            "- Use **ABC segmentation**: A-items get advanced models, C-items use simpler models.\n"
-            "\n"
-            "## Case examples (illustrative)\n"
-            "- Company A: inventory surplus → ABC + SES → **12% inventory turnover improvement**.\n"
-            "- Company B: promo spike → add promo drivers → **18% stockout reduction**.\n"
-        )
-        sources = [
-            {
-                "chunk_id": "built_in_definition",
-                "source": "built_in_definition",
-                "score": 1.0,
-                "text": "수요예측 방법론",
-                "page_text": "",
-            }
-        ]
+        response_key = ("builtin", "forecast")
         tool_calls.append("definition_fallback")
         intent = "PLANNING"
         handled = True
     elif "안전재고" in text or "safety stock" in text:
-        answer = (
-            "Safety stock is buffer inventory used to absorb demand variability and lead-time uncertainty. "
-            "A common formula is Safety Stock = Z × σd × √L, where Z is the service-level z-score, "
-            "σd is the daily demand standard deviation, and L is lead time (days)."
-        )
-        sources = [
-            {
-                "chunk_id": "built_in_definition",
-                "source": "built_in_definition",
-                "score": 1.0,
-                "text": "안전재고 공식",
-                "page_text": "",
-            }
-        ]
+        response_key = ("builtin", "safety_stock")
         tool_calls.append("definition_fallback")
         intent = "INVENTORY"
         handled = True
 
+    if intent == "DEFINITION" and not dict_results:
+        # Routed on a definition cue alone: look for a term named inside the query.
+        with trace.span("span_lookup"):
+            dict_results, _ = await aspan_lookup(query)
+
     if intent == "DEFINITION":
         if dict_results:
-            entry = dict_results[0]
-            answer = (
-                f"{entry['term']}: {entry['definition']}\n"
-                f"Business meaning: {entry['business_meaning']}\n"
-                f"Formula: {entry.get('formula', 'N/A')}"
-            )
-            sources = [
-                {
-                    "chunk_id": f"dict:{entry['term']}",
-                    "source": "data/scm_dictionary.json",
-                    "score": 1.0,
-                    "text": entry["term"],
-                    "page_text": "",
-                }
-            ]
+            dictionary_entry = dict_results[0]
+            response_key = ("dictionary", dictionary_entry["term"])
             tool_calls.append("dictionary_lookup")
             handled = True
         else:
             if "scm" in text or "supply chain" in text:
-                answer = (
-                    "SCM (Supply Chain Management) is the end-to-end management of "
-                    "planning, sourcing, production, logistics, and fulfillment to "
-                    "deliver products efficiently and reliably."
-                )
+                response_key = ("builtin", "scm")
                 tool_calls.append("definition_fallback")
-                sources = [
-                    {
-                        "chunk_id": "built_in_definition",
-                        "source": "built_in_definition",
-                        "score": 1.0,
-                        "text": "SCM",
-                        "page_text": "",
-                    }
-                ]
                 handled = True
             else:
                 intent = "GENERAL"
 
     if intent == "CALCULATION":
-        calc = _run_calculator(query)
-        answer = f"{calc['metric']} = {calc['value']}"
+        response_key = ("calculator", _calculator_key(query))
         tool_calls.append("calculator")
         handled = True
 
+    if emit is not None:
+        # Sent once the built-in and definition fallbacks have settled the intent, so it matches `done`.
+        emit("route", {"intent": intent, "confidence": confidence})
+
     if not handled:
-        domain = _detect_rag_domain(query)
-        sources = search(query, top_k=top_k, domain=domain)
-        context_blocks = []
-        for s in sources:
-            if s.get("page_text"):
-                context_blocks.append(s["page_text"])
-            else:
-                context_blocks.append(s["text"])
-        context = " ".join(context_blocks)[:2000]
-        focused = _select_relevant_sentences(query, context, max_sentences=3)
-        if focused:
-            answer = focused
-        else:
-            summary = _summarize_context(context, max_sentences=3)
-            answer = summary if summary else "No relevant information found in sources."
+        domain = _detect_rag_domain(query, hits)
+        web_task = None
+        if confidence >= confidence_threshold and _should_hedge(dict_results, domain):
+            # Start the web fallback now so a RAG miss only waits for whatever is left of it.
+            web_task = asyncio.create_task(aweb_search(query, max_results=3, timeout=remaining(deadline)))
+        try:
+            candidates = []
+            if not expired(deadline):
+                with trace.span("search"):
+                    candidates = await searcher(query, top_k=candidate_pool(top_k), domain=domain, deadline=deadline)
+                if emit is not None:
+                    # First-pass order; the answer event carries the re-ranked sources.
+                    emit("sources", {"sources": _public_sources(candidates[:top_k])})
+            # Re-ranking and sentence selection are CPU work; keep them off the event loop.
+            answer, sources, rerank_stats = await asyncio.to_thread(
+                _rag_answer, query, candidates, top_k, trace, deadline
+            )
+        except BaseException:
+            if web_task is not None:
+                web_task.cancel()
+            raise
         tool_calls.append("rag_search")
 
         if answer == "No relevant information found in sources." or _scores_too_low(sources):
-            web_results = web_search(query, max_results=3)
+            with trace.span("web_search"):
+                if web_task is not None:
+                    web_results = await web_task
+                    web_hedge = "used"
+                elif expired(deadline):
+                    web_results = []
+                else:
+                    web_results = await aweb_search(query, max_results=3, timeout=remaining(deadline))
             if web_results:
                 answer = " ".join([r["snippet"] for r in web_results if r["snippet"]])
                 sources = [
@@ -416,6 +484,12 @@ def run_agent(query: str, confidence_threshold: float = 0.55, top_k: int = 3) ->
                     for idx, r in enumerate(web_results, start=1)
                 ]
                 tool_calls.append("web_search")
+        elif web_task is not None:
+            web_task.cancel()
+            web_hedge = "cancelled"
+        # Out of time before retrieval finished: a stage was skipped or cut short, so the
+        # answer is the best one found so far.
+        degraded = expired(deadline)
 
     if confidence < confidence_threshold:
         related = ", ".join(related_terms[:5]) if related_terms else "No related terms found"
@@ -424,15 +498,25 @@ def run_agent(query: str, confidence_threshold: float = 0.55, top_k: int = 3) ->
             f"Related terms: {related}"
         )
         sources = []
-
-    answer = _to_markdown(answer)
-
-    formatted = ANSWER_TEMPLATE.format(
-        answer=answer,
-        sources=_format_sources(sources),
-        confidence=confidence,
-        domain=intent,
-    )
+        response_key = None
+
+    with trace.span("format"):
+        if response_key is not None:
+            response = RESPONSES.get(response_key, dictionary_entry)
+            answer = response["answer"]
+            sources = [dict(source) for source in response["sources"]]
+            formatted = RESPONSES.formatted(response_key, intent, confidence)
+        else:
+            answer = _to_markdown(answer)
+            formatted = ANSWER_TEMPLATE.format(
+                answer=answer,
+                sources=_format_sources(sources),
+                confidence=confidence,
+                domain=intent,
+            )
+    if emit is not None:
+        emit("answer", {"answer": answer, "sources": sources})
+    trace.record("total", time.perf_counter() - start)
 
     payload = {
         "run_id": str(uuid.uuid4()),
@@ -442,7 +526,120 @@ def run_agent(query: str, confidence_threshold: float = 0.55, top_k: int = 3) ->
         "sources": [s["source"] for s in sources],
         "confidence": confidence,
         "answer": answer,
+        "rerank": rerank_stats,
+        "web_hedge": web_hedge,
+        "deadline_ms": deadline_ms or None,
+        "degraded": degraded,
+        # Milliseconds per stage; the log write itself is only in the /metrics histograms.
+        "spans": trace.spans,
+    }
+    with trace.span("log"):
+        _log_run(payload)
+
+    return {
+        "answer": answer,
+        "sources": sources,
+        "confidence": confidence,
+        "domain": intent,
+        "degraded": degraded,
+        "formatted": formatted,
     }
-    _log_run(payload)
 
-    return {"answer": answer, "sources": sources, "confidence": confidence, "domain": intent, "formatted": formatted}
+
+class _SearchBatch:
+    # Holds back the RAG searches of concurrent runs until every unfinished run is waiting on one,
+    # then scores them with one asearch_many call per (top_k, domain).
+    def __init__(self, runs: int) -> None:
+        self._running = runs
+        self._pending: List[Tuple[str, int, Optional[str], asyncio.Future]] = []
+        # The event loop only keeps weak references to tasks; these stay referenced until they finish.
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def search(
+        self, query: str, top_k: int = 3, domain: Optional[str] = None, deadline: Optional[float] = None
+    ) -> List[Dict]:
+        # Batched scoring cannot stop part-way, so a run's deadline only applies around it.
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((query, top_k, domain, future))
+        self._maybe_flush()
+        return await future
+
+    def finished(self) -> None:
+        self._running -= 1
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if self._pending and len(self._pending) == self._running:
+            pending, self._pending = self._pending, []
+            task = asyncio.create_task(self._flush(pending))
+            self._flushes.add(task)
+            task.add_done_callback(lambda done: self._settle(done, pending))
+
+    def _settle(self, task: asyncio.Task, pending: List[Tuple[str, int, Optional[str], asyncio.Future]]) -> None:
+        # Runs however the flush ended, even if it was cancelled before it started, so no run is left
+        # waiting on a future that will never resolve.
+        self._flushes.discard(task)
+        error = None if task.cancelled() else task.exception()
+        for *_, future in pending:
+            if future.done():
+                continue
+            if task.cancelled():
+                future.cancel()
+            else:
+                future.set_exception(error or RuntimeError("Batched RAG search did not complete."))
+
+    async def _flush(self, pending: List[Tuple[str, int, Optional[str], asyncio.Future]]) -> None:
+        groups: Dict[Tuple[int, Optional[str]], List[Tuple[str, asyncio.Future]]] = defaultdict(list)
+        for query, top_k, domain, future in pending:
+            groups[(top_k, domain)].append((query, future))
+        for (top_k, domain), items in groups.items():
+            try:
+                results = await asearch_many([query for query, _ in items], top_k, domain)
+            except Exception as exc:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            for (_, future), hits in zip(items, results):
+                # A run cancelled while it waited has already given up on its future.
+                if not future.done():
+                    future.set_result(hits)
+
+
+async def arun_agent_batch(requests: List[Dict]) -> List[Dict]:
+    # Each request holds arun_agent keyword arguments; results come back in request order.
+    batch = _SearchBatch(len(requests))
+
+    async def run(request: Dict) -> Dict:
+        try:
+            return await arun_agent(**request, searcher=batch.search)
+        finally:
+            batch.finished()
+
+    results = await asyncio.gather(*(run(request) for request in requests))
+    # One flush for the whole batch, so its runs are on disk when the caller gets the results.
+    await asyncio.to_thread(RUN_LOGGER.flush)
+    return list(results)
+
+
+async def astream_agent(
+    query: str, top_k: int = 3, deadline_ms: Optional[int] = None
+) -> AsyncIterator[Tuple[str, Dict]]:
+    # Yields (event, data) as arun_agent progresses: route, sources, answer, then done with the full result.
+    events: "asyncio.Queue[Tuple[str, Dict]]" = asyncio.Queue()
+
+    def emit(event: str, data: Dict) -> None:
+        events.put_nowait((event, data))
+
+    task = asyncio.create_task(arun_agent(query, top_k=top_k, deadline_ms=deadline_ms, emit=emit))
+    task.add_done_callback(lambda _: events.put_nowait(("done", {})))
+    try:
+        while True:
+            event, data = await events.get()
+            if event == "done":
+                break
+            yield event, data
+        yield "done", task.result()
+    finally:
+        # A client that disconnects mid-stream stops the run.
+        task.cancel()
@@ -0,0 +1,114 @@
+from collections import Counter
+
+from tools.keyword_matcher import KeywordMatcher
+
+
+INTENTS = ["PLANNING", "INVENTORY", "LOGISTICS", "DEFINITION", "CALCULATION", "GENERAL"]
+
+KEYWORDS = {
+    "PLANNING": [
+        "forecast",
+        "s&op",
+        "sales and operations",
+        "demand plan",
+        "capacity",
+        "수요예측",
+        "수요 계획",
+        "판매 운영",
+        "s&op",
+    ],
+    "INVENTORY": [
+        "inventory",
+        "safety stock",
+        "reorder",
+        "cycle count",
+        "abc",
+        "재고",
+        "안전재고",
+        "재주문",
+        "재주문점",
+        "재고회전",
+    ],
+    "LOGISTICS": ["transport", "freight", "warehouse", "delivery", "carrier"],
+    "DEFINITION": [
+        "define",
+        "what is",
+        "meaning",
+        "term",
+        "glossary",
+        "정의",
+        "뜻",
+        "의미",
+        "뭐야",
+        "무엇",
+    ],
+    "CALCULATION": [
+        "calculate",
+        "compute",
+        "formula",
+        "eoq",
+        "reorder point",
+        "fill rate",
+        "계산",
+        "산출",
+        "공식",
+    ],
+}
+
+DEMAND_KEYWORDS = [
+    "demand",
+    "forecast",
+    "s&op",
+    "sales and operations",
+    "sales & operations",
+    "demand planning",
+]
+
+SUPPLY_KEYWORDS = [
+    "supply",
+    "supplier",
+    "procurement",
+    "logistics",
+    "transport",
+    "warehouse",
+]
+
+SCM_KEYWORDS = [
+    "scm",
+    "supply chain",
+    "supply",
+    "supplier",
+    "procurement",
+    "logistics",
+    "warehouse",
+    "inventory",
+    "demand",
+    "forecast",
+    "s&op",
+    "otif",
+    "fill rate",
+    "reorder point",
+    "safety stock",
+    "수요",
+    "공급",
+    "공급망",
+    "조달",
+    "물류",
+    "창고",
+    "재고",
+    "예측",
+]
+
+# One automaton for intents, RAG domains and the SCM guard, built once at import.
+MATCHER = KeywordMatcher(
+    {
+        **{("intent", intent): words for intent, words in KEYWORDS.items()},
+        ("domain", "demand"): DEMAND_KEYWORDS,
+        ("domain", "supply"): SUPPLY_KEYWORDS,
+        ("guard", "scm"): SCM_KEYWORDS,
+    }
+)
+
+
+def keyword_hits(query: str) -> Counter:
+    return MATCHER.hits(query.lower())
@@ -1,66 +1,17 @@
-from typing import Dict, List
+from collections import Counter
+from typing import Dict, List, Optional
 
-INTENTS = ["PLANNING", "INVENTORY", "LOGISTICS", "DEFINITION", "CALCULATION", "GENERAL"]
+from agent.keywords import INTENTS, KEYWORDS, keyword_hits
 
-KEYWORDS = {
-    "PLANNING": [
-        "forecast",
-        "s&op",
-        "sales and operations",
-        "demand plan",
-        "capacity",
-        "수요예측",
-        "수요 계획",
-        "판매 운영",
-        "s&op",
-    ],
-    "INVENTORY": [
-        "inventory",
-        "safety stock",
-        "reorder",
-        "cycle count",
-        "abc",
-        "재고",
-        "안전재고",
-        "재주문",
-        "재주문점",
-        "재고회전",
-    ],
-    "LOGISTICS": ["transport", "freight", "warehouse", "delivery", "carrier"],
-    "DEFINITION": [
-        "define",
-        "what is",
-        "meaning",
-        "term",
-        "glossary",
-        "정의",
-        "뜻",
-        "의미",
-        "뭐야",
-        "무엇",
-    ],
-    "CALCULATION": [
-        "calculate",
-        "compute",
-        "formula",
-        "eoq",
-        "reorder point",
-        "fill rate",
-        "계산",
-        "산출",
-        "공식",
-    ],
-}
 
-
-def route(query: str, related_terms: List[str]) -> Dict:
+def route(query: str, related_terms: List[str], hits: Optional[Counter] = None) -> Dict:
     text = query.lower()
     scores = {intent: 0.0 for intent in INTENTS}
+    hits = keyword_hits(query) if hits is None else hits
 
-    for intent, words in KEYWORDS.items():
-        for word in words:
-            if word in text:
-                scores[intent] += 0.3
+    for intent in KEYWORDS:
+        for _ in range(hits[("intent", intent)]):
+            scores[intent] += 0.3
 
     if related_terms:
         scores["DEFINITION"] += 0.2
@@ -1,17 +1,25 @@
+import json
+import logging
 from pathlib import Path
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 
-from agent.engine import run_agent
-from config import index_exists
+from agent.engine import RESPONSES, RUN_LOGGER, arun_agent, arun_agent_batch, astream_agent
+from config import QUERY_BATCH_MAX, index_exists
 from index_loader import ensure_indexes
+from tools.index_registry import REGISTRY
+from tools.dictionary_lookup import load_dictionary
+from tools.metrics import render_metrics
+from tools.rag_search import cache_stats
+from tools.web_search import POOL as WEB_POOL
 
 
 app = FastAPI(title="SCM Agent API", version="1.0.0")
+LOGGER = logging.getLogger(__name__)
 BASE_DIR = Path(__file__).resolve().parents[1]
 FRONTEND_DIR = BASE_DIR / "frontend"
 if FRONTEND_DIR.exists():
@@ -21,6 +29,7 @@ if FRONTEND_DIR.exists():
 class QueryRequest(BaseModel):
     query: str = Field(..., min_length=1)
     top_k: int = Field(3, ge=1, le=10)
+    deadline_ms: Optional[int] = Field(None, ge=1)
 
 
 class SourceItem(BaseModel):
@@ -36,12 +45,22 @@ class QueryResponse(BaseModel):
     sources: List[SourceItem]
     confidence: float
     domain: str
+    degraded: bool = False
     formatted: str
 
 
 @app.on_event("startup")
 def _startup() -> None:
     ensure_indexes()
+    REGISTRY.preload(["supply", "demand"])
+    RESPONSES.build(load_dictionary())
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    # Write out queued run-log entries before the worker exits.
+    RUN_LOGGER.close()
+    await WEB_POOL.aclose()
 
 
 @app.get("/health")
@@ -52,9 +71,17 @@ def health() -> dict:
             "supply": index_exists("supply"),
             "demand": index_exists("demand"),
         },
+        "search_cache": cache_stats(),
+        "run_log": RUN_LOGGER.stats(),
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    # Prometheus text format: per-stage latency histograms of run_agent.
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/", response_class=HTMLResponse)
 def root() -> HTMLResponse:
     index_path = FRONTEND_DIR / "index.html"
@@ -63,9 +90,79 @@ def root() -> HTMLResponse:
     return HTMLResponse("<h3>Frontend missing. Build the frontend assets.</h3>")
 
 
+def _deadline(body_ms: Optional[int], header_ms: Optional[int]) -> Optional[int]:
+    # The deadline can come from the body or an X-Deadline-Ms header; the tighter one wins.
+    deadlines = [d for d in (body_ms, header_ms) if d is not None]
+    return min(deadlines) if deadlines else None
+
+
 @app.post("/query", response_model=QueryResponse)
-def query(payload: QueryRequest) -> QueryResponse:
+async def query(
+    payload: QueryRequest, x_deadline_ms: Optional[int] = Header(None, ge=1)
+) -> QueryResponse:
     if not payload.query.strip():
         raise HTTPException(status_code=400, detail="Query must not be empty.")
-    result = run_agent(payload.query, top_k=payload.top_k)
+    deadline_ms = _deadline(payload.deadline_ms, x_deadline_ms)
+    # Runs on the event loop; blocking tool work goes to worker threads only while it runs.
+    result = await arun_agent(payload.query, top_k=payload.top_k, deadline_ms=deadline_ms)
     return QueryResponse(**result)
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream(query: str, top_k: int, deadline_ms: Optional[int]) -> AsyncIterator[str]:
+    try:
+        async for event, data in astream_agent(query, top_k=top_k, deadline_ms=deadline_ms):
+            if event == "done":
+                data = QueryResponse(**data).model_dump()
+            yield _sse(event, data)
+    except Exception:
+        # The response has already started, so the client only gets an error event; keep the traceback.
+        LOGGER.exception("Streaming query failed: %r", query)
+        yield _sse("error", {"detail": "Query failed."})
+
+
+def _stream_response(query: str, top_k: int, deadline_ms: Optional[int]) -> StreamingResponse:
+    if not query.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty.")
+    return StreamingResponse(
+        _stream(query, top_k, deadline_ms),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream until it ends.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/query/stream")
+async def query_stream(
+    payload: QueryRequest, x_deadline_ms: Optional[int] = Header(None, ge=1)
+) -> StreamingResponse:
+    return _stream_response(payload.query, payload.top_k, _deadline(payload.deadline_ms, x_deadline_ms))
+
+
+@app.get("/query/stream")
+async def query_stream_get(
+    query: str,
+    top_k: int = Query(3, ge=1, le=10),
+    deadline_ms: Optional[int] = Query(None, ge=1),
+    x_deadline_ms: Optional[int] = Header(None, ge=1),
+) -> StreamingResponse:
+    # GET form for EventSource clients, which cannot send a body.
+    return _stream_response(query, top_k, _deadline(deadline_ms, x_deadline_ms))
+
+
+@app.post("/query/batch", response_model=List[QueryResponse])
+async def query_batch(payload: List[QueryRequest]) -> List[QueryResponse]:
+    if not payload:
+        raise HTTPException(status_code=400, detail="Batch must not be empty.")
+    if len(payload) > QUERY_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Batch is limited to {QUERY_BATCH_MAX} queries.")
+    if any(not item.query.strip() for item in payload):
+        raise HTTPException(status_code=400, detail="Query must not be empty.")
+    # RAG-bound queries are scored together; results keep the request order.
+    results = await arun_agent_batch(
+        [{"query": item.query, "top_k": item.top_k, "deadline_ms": item.deadline_ms} for item in payload]
+    )
+    return [QueryResponse(**result) for result in results]
@@ -1,6 +1,5 @@
 import io
 import json
-import pickle
 import re
 import urllib.request
 from pathlib import Path
@@ -12,14 +11,16 @@ from pptx import Presentation
 from docx import Document
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+from config import CHUNK_MAX_WORDS, CHUNK_MIN_WORDS, CHUNK_OVERLAP_WORDS
 from data.build_synthetic_docs import generate_synthetic_docs
+from tools.chunker import chunk_file
+from tools.index_store import write_index
 
 
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
 DOCS_DIR = DATA_DIR / "enterprise_knowledge"
 VECTOR_DIR = BASE_DIR / "storage" / "vector_db"
-INDEX_PATH = VECTOR_DIR / "index.pkl"
 SEED_URLS_PATH = DATA_DIR / "seed_urls.json"
 DICTIONARY_PATH = DATA_DIR / "scm_dictionary.json"
 RAW_DIR = DATA_DIR / "raw_data"
@@ -29,21 +30,6 @@ def _normalize_text(text: str) -> str:
     return re.sub(r"\s+", " ", text).strip()
 
 
-def _chunk_text(text: str, min_words: int = 600, max_words: int = 900) -> List[str]:
-    words = text.split()
-    if not words:
-        return []
-    chunks = []
-    start = 0
-    step = max_words
-    while start < len(words):
-        end = min(start + step, len(words))
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        start = end
-    return chunks
-
-
 def _load_seed_urls() -> List[str]:
     if not SEED_URLS_PATH.exists():
         return []
@@ -135,6 +121,7 @@ def _load_docs() -> List[Dict[str, str]]:
             {
                 "id": path.stem,
                 "source": str(path),
+                "path": str(path),
                 "text": text,
                 "page_text": page_text,
             }
@@ -151,13 +138,21 @@ def _build_dictionary_if_missing() -> None:
 def _build_vector_index(docs: List[Dict[str, str]]) -> None:
     chunks = []
     for doc in docs:
-        for idx, chunk in enumerate(_chunk_text(doc["text"])):
+        pieces = chunk_file(
+            Path(doc["path"]),
+            max_words=CHUNK_MAX_WORDS,
+            min_words=CHUNK_MIN_WORDS,
+            overlap_words=CHUNK_OVERLAP_WORDS,
+        )
+        for idx, piece in enumerate(pieces):
             chunks.append(
                 {
                     "chunk_id": f"{doc['id']}_chunk_{idx}",
                     "source": doc["source"],
-                    "text": chunk,
+                    "text": piece["text"],
                     "page_text": doc.get("page_text", ""),
+                    "path": doc["path"],
+                    "offsets": [piece["start"], piece["end"]],
                 }
             )
 
@@ -167,9 +162,7 @@ def _build_vector_index(docs: List[Dict[str, str]]) -> None:
     vectorizer = TfidfVectorizer(stop_words="english")
     matrix = vectorizer.fit_transform(texts)
 
-    VECTOR_DIR.mkdir(parents=True, exist_ok=True)
-    with INDEX_PATH.open("wb") as f:
-        pickle.dump({"vectorizer": vectorizer, "matrix": matrix, "chunks": chunks}, f)
+    write_index(VECTOR_DIR, vectorizer, matrix, chunks)
 
 
 def main() -> None:
@@ -216,7 +209,7 @@ def main() -> None:
     _build_dictionary_if_missing()
     docs = _load_docs()
     _build_vector_index(docs)
-    print(f"Built vector index with {len(docs)} docs at {INDEX_PATH}")
+    print(f"Built vector index with {len(docs)} docs at {VECTOR_DIR}")
 
 
 if __name__ == "__main__":
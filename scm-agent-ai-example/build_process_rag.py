@@ -1,5 +1,5 @@
+import argparse
 import json
-import pickle
 import re
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional
@@ -7,6 +7,11 @@ from urllib.parse import urlparse
 
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+from config import CHUNK_MAX_WORDS, CHUNK_MIN_WORDS, CHUNK_OVERLAP_WORDS, INDEX_SHARDS
+from tools.ann import build_ann
+from tools.chunker import chunk_file, chunk_text
+from tools.index_store import write_index
+
 
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
@@ -21,25 +26,6 @@ SUPPLY_INDEX_DIR = BASE_DIR / "storage" / "vector_db_supply"
 DEMAND_INDEX_DIR = BASE_DIR / "storage" / "vector_db_demand"
 
 
-def _normalize_text(text: str) -> str:
-    return re.sub(r"\s+", " ", text).strip()
-
-
-def _chunk_text(text: str, min_words: int = 600, max_words: int = 900) -> List[str]:
-    words = text.split()
-    if not words:
-        return []
-    chunks = []
-    start = 0
-    step = max_words
-    while start < len(words):
-        end = min(start + step, len(words))
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        start = end
-    return chunks
-
-
 def _load_url_list(path: Path) -> List[str]:
     if not path.exists():
         return []
@@ -113,43 +99,86 @@ def _collect_docs(urls: Iterable[str]) -> List[Dict[str, str]]:
         processed_path = PROCESS_DIR / f"{raw_path.stem}.txt"
         if not processed_path.exists():
             continue
-        text = _normalize_text(processed_path.read_text(encoding="utf-8", errors="ignore"))
-        if not text:
-            continue
+        # Text is streamed from the processed file at build time; chunks keep byte offsets into it.
         docs.append(
             {
                 "id": processed_path.stem,
                 "source": str(raw_path),
-                "text": text,
+                "path": str(processed_path),
             }
         )
     return docs
 
 
-def _build_vector_index(docs: List[Dict[str, str]], out_dir: Path) -> None:
+def _build_vector_index(
+    docs: List[Dict[str, str]],
+    out_dir: Path,
+    shards: int = 1,
+    ann_dims: int = 0,
+    ann_clusters: int = 0,
+    max_words: int = CHUNK_MAX_WORDS,
+    min_words: int = CHUNK_MIN_WORDS,
+    overlap_words: int = CHUNK_OVERLAP_WORDS,
+) -> None:
     chunks = []
+    doc_chunk_ptr = [0]
+    sizes = {"max_words": max_words, "min_words": min_words, "overlap_words": overlap_words}
     for doc in docs:
-        for idx, chunk in enumerate(_chunk_text(doc["text"])):
-            chunks.append(
-                {
-                    "chunk_id": f"{doc['id']}_chunk_{idx}",
-                    "source": doc["source"],
-                    "text": chunk,
-                }
-            )
+        if "path" in doc:
+            pieces = chunk_file(Path(doc["path"]), **sizes)
+        else:
+            pieces = chunk_text(doc["text"], **sizes)
+        for idx, piece in enumerate(pieces):
+            chunk = {
+                "chunk_id": f"{doc['id']}_chunk_{idx}",
+                "source": doc["source"],
+                "text": piece["text"],
+            }
+            if "path" in doc:
+                chunk.update(path=doc["path"], offsets=[piece["start"], piece["end"]])
+            chunks.append(chunk)
+        doc_chunk_ptr.append(len(chunks))
     texts = [c["text"] for c in chunks]
     if not texts:
         raise RuntimeError("No documents available to build the vector index.")
     vectorizer = TfidfVectorizer(stop_words="english")
     matrix = vectorizer.fit_transform(texts)
 
-    out_dir.mkdir(parents=True, exist_ok=True)
-    index_path = out_dir / "index.pkl"
-    with index_path.open("wb") as f:
-        pickle.dump({"vectorizer": vectorizer, "matrix": matrix, "chunks": chunks}, f)
+    ann = build_ann(matrix, dims=ann_dims, clusters=ann_clusters) if ann_dims > 0 else None
+    write_index(
+        out_dir, vectorizer, matrix, chunks, shards=shards, ann=ann, doc_chunk_ptr=doc_chunk_ptr
+    )
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the supply/demand RAG indexes.")
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=INDEX_SHARDS,
+        help="Split each index into N row shards scored in parallel at query time.",
+    )
+    parser.add_argument(
+        "--ann",
+        action="store_true",
+        help="Also build a compressed dense projection and clusters for approximate search.",
+    )
+    parser.add_argument("--ann-dims", type=int, default=128, help="Projection dimensions.")
+    parser.add_argument(
+        "--ann-clusters", type=int, default=0, help="Cluster count (default: sqrt of chunk count)."
+    )
+    parser.add_argument("--chunk-words", type=int, default=CHUNK_MAX_WORDS, help="Maximum words per chunk.")
+    parser.add_argument(
+        "--chunk-min-words",
+        type=int,
+        default=CHUNK_MIN_WORDS,
+        help="A chunk is cut at the last page or sentence end past this many words.",
+    )
+    parser.add_argument(
+        "--chunk-overlap", type=int, default=CHUNK_OVERLAP_WORDS, help="Words repeated from the previous chunk."
+    )
+    args = parser.parse_args()
+
     if not PROCESS_DIR.exists():
         raise RuntimeError("Missing process_data directory. Run: python process_data.py")
 
@@ -159,8 +188,18 @@ def main() -> None:
     supply_docs = _collect_docs(supply_urls)
     demand_docs = _collect_docs(demand_urls)
 
-    _build_vector_index(supply_docs, SUPPLY_INDEX_DIR)
-    _build_vector_index(demand_docs, DEMAND_INDEX_DIR)
+    ann_dims = args.ann_dims if args.ann else 0
+    for docs, out_dir in ((supply_docs, SUPPLY_INDEX_DIR), (demand_docs, DEMAND_INDEX_DIR)):
+        _build_vector_index(
+            docs,
+            out_dir,
+            shards=args.shards,
+            ann_dims=ann_dims,
+            ann_clusters=args.ann_clusters,
+            max_words=args.chunk_words,
+            min_words=args.chunk_min_words,
+            overlap_words=args.chunk_overlap,
+        )
 
     print(
         f"Built supply index with {len(supply_docs)} docs and demand index with {len(demand_docs)} docs."
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -11,21 +11,76 @@ def _path_env(name: str, default: Path) -> Path:
     return Path(value) if value else default
 
 
+def _int_env(name: str, default: int) -> int:
+    value = os.getenv(name, "").strip()
+    try:
+        return int(value) if value else default
+    except ValueError:
+        return default
+
+
+def _bool_env(name: str, default: bool) -> bool:
+    value = os.getenv(name, "").strip().lower()
+    if not value:
+        return default
+    return value in {"1", "true", "yes", "on"}
+
+
 INDEX_CACHE_DIR = _path_env("INDEX_CACHE_DIR", BASE_DIR / "cache")
+INDEX_MEMORY_BUDGET_MB = _int_env("INDEX_MEMORY_BUDGET_MB", 1024)
+INDEX_SHARDS = _int_env("INDEX_SHARDS", 1)
+CHUNK_MAX_WORDS = _int_env("CHUNK_MAX_WORDS", 900)
+CHUNK_MIN_WORDS = _int_env("CHUNK_MIN_WORDS", 600)
+CHUNK_OVERLAP_WORDS = _int_env("CHUNK_OVERLAP_WORDS", 0)
+RAG_FANOUT = _bool_env("RAG_FANOUT", True)
+RAG_SEARCH_WORKERS = _int_env("RAG_SEARCH_WORKERS", 4)
+RAG_ANN_PROBES = _int_env("RAG_ANN_PROBES", 0)
+RAG_DOC_CANDIDATES = _int_env("RAG_DOC_CANDIDATES", 0)
+RAG_CACHE_SIZE = _int_env("RAG_CACHE_SIZE", 1024)
+RAG_CACHE_TTL_SECONDS = _int_env("RAG_CACHE_TTL_SECONDS", 300)
+RERANKER = os.getenv("RERANKER", "bm25f").strip().lower()
+RERANK_CANDIDATES = _int_env("RERANK_CANDIDATES", 20)
+RERANK_BUDGET_MS = _int_env("RERANK_BUDGET_MS", 25)
+QUERY_BATCH_MAX = _int_env("QUERY_BATCH_MAX", 500)
+REQUEST_DEADLINE_MS = _int_env("REQUEST_DEADLINE_MS", 0)
+WEB_SEARCH_URL = os.getenv("WEB_SEARCH_URL", "https://duckduckgo.com/html/").strip()
+WEB_SEARCH_TIMEOUT_SECONDS = _int_env("WEB_SEARCH_TIMEOUT_SECONDS", 8)
+WEB_HEDGE = _bool_env("WEB_HEDGE", True)
+WEB_POOL_SIZE = _int_env("WEB_POOL_SIZE", 20)
+WEB_POOL_PER_HOST = _int_env("WEB_POOL_PER_HOST", 4)
+WEB_KEEPALIVE_SECONDS = _int_env("WEB_KEEPALIVE_SECONDS", 30)
+RUN_LOG_QUEUE_SIZE = _int_env("RUN_LOG_QUEUE_SIZE", 10000)
+RUN_LOG_BATCH_SIZE = _int_env("RUN_LOG_BATCH_SIZE", 256)
+RUN_LOG_FLUSH_MS = _int_env("RUN_LOG_FLUSH_MS", 1000)
+RUN_LOG_MAX_MB = _int_env("RUN_LOG_MAX_MB", 50)
+RUN_LOG_BACKUPS = _int_env("RUN_LOG_BACKUPS", 10)
+
+INDEX_DIR_NAMES = {
+    "supply": "vector_db_supply",
+    "demand": "vector_db_demand",
+    None: "vector_db",
+}
+INDEX_FILES = ("meta.json", "index.pkl")
+
+
+def get_index_dirs(domain: Optional[str] = None) -> Tuple[Path, Path]:
+    name = INDEX_DIR_NAMES.get(domain, INDEX_DIR_NAMES[None])
+    return INDEX_CACHE_DIR / name, BASE_DIR / "storage" / name
 
 
 def get_index_path(domain: Optional[str] = None) -> Path:
-    if domain == "supply":
-        cache_path = INDEX_CACHE_DIR / "vector_db_supply" / "index.pkl"
-        default_path = BASE_DIR / "storage" / "vector_db_supply" / "index.pkl"
-    elif domain == "demand":
-        cache_path = INDEX_CACHE_DIR / "vector_db_demand" / "index.pkl"
-        default_path = BASE_DIR / "storage" / "vector_db_demand" / "index.pkl"
-    else:
-        cache_path = INDEX_CACHE_DIR / "vector_db" / "index.pkl"
-        default_path = BASE_DIR / "storage" / "vector_db" / "index.pkl"
-    return cache_path if cache_path.exists() else default_path
+    # Memory-mapped indexes (meta.json) win over legacy pickles; the cache wins over storage.
+    for index_dir in get_index_dirs(domain):
+        for filename in INDEX_FILES:
+            path = index_dir / filename
+            if path.exists():
+                return path
+    return get_index_dirs(domain)[1] / INDEX_FILES[0]
 
 
 def index_exists(domain: Optional[str] = None) -> bool:
     return get_index_path(domain).exists()
+
+
+def available_domains() -> List[Optional[str]]:
+    return [domain for domain in INDEX_DIR_NAMES if index_exists(domain)]
@@ -0,0 +1,93 @@
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+from scipy.sparse import vstack
+from sklearn.metrics.pairwise import cosine_similarity
+
+from tools.ann import ann_top_k
+from tools.index_registry import get_index
+from tools.retrieval import merge_top_k, top_k_scores
+
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+GOLDEN_PATH = BASE_DIR / "data" / "scm_golden_set.json"
+
+
+def _load_queries(index: Dict, sample: int, seed: int) -> List[str]:
+    golden = json.loads(GOLDEN_PATH.read_text(encoding="utf-8"))
+    queries = [row["query"] for row in golden if isinstance(row, dict)]
+    # Openings of random chunks stand in for production queries that hit the corpus directly.
+    rng = random.Random(seed)
+    chunks = index["chunks"]
+    for idx in rng.sample(range(len(chunks)), min(sample, len(chunks))):
+        words = chunks[idx]["text"].split()
+        start = rng.randrange(max(1, len(words) - 8))
+        queries.append(" ".join(words[start : start + 8]))
+    return queries
+
+
+def _timed(fn: Callable, query_vecs: List) -> tuple[List, np.ndarray]:
+    results, latencies = [], []
+    for query_vec in query_vecs:
+        start = time.perf_counter()
+        results.append(fn(query_vec))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.asarray(latencies)
+
+
+def report(domain: str, top_k: int, probes: List[int], sample: int, seed: int) -> None:
+    index = get_index(domain)
+    if "ann" not in index:
+        print(f"Index for {domain} has no ANN data. Run: python build_process_rag.py --ann")
+        return
+    matrix = vstack([shard["matrix"] for shard in index["shards"]]).tocsr()
+    queries = _load_queries(index, sample, seed)
+    query_vecs = [index["vectorizer"].transform([q]) for q in queries]
+
+    def exact(query_vec):
+        scores = cosine_similarity(query_vec, matrix).ravel()
+        ranked = np.argsort(-scores, kind="stable")[:top_k]
+        return {int(i) for i in ranked if scores[i] > 0}
+
+    def postings(query_vec):
+        parts = []
+        for shard in index["shards"]:
+            ids, scores = top_k_scores(query_vec, shard["postings"], top_k)
+            parts.append((ids + shard["offset"], scores))
+        return merge_top_k(parts, top_k, index["n_chunks"])
+
+    truth, exact_ms = _timed(exact, query_vecs)
+    _, postings_ms = _timed(postings, query_vecs)
+    scored = [i for i, ids in enumerate(truth) if ids]
+    print(
+        f"{domain}: {index['n_chunks']} chunks, {index['ann']['centroids'].shape[0]} clusters, "
+        f"{len(scored)} queries with matches, recall@{top_k}"
+    )
+    print(f"{'mode':>12} {'recall':>8} {'mean ms':>8} {'p95 ms':>8}")
+    print(f"{'cosine':>12} {1.0:>8.3f} {exact_ms.mean():>8.2f} {np.percentile(exact_ms, 95):>8.2f}")
+    print(f"{'postings':>12} {1.0:>8.3f} {postings_ms.mean():>8.2f} {np.percentile(postings_ms, 95):>8.2f}")
+    for probe in probes:
+        found, ann_ms = _timed(lambda v: ann_top_k(v, index, top_k, probe)[0], query_vecs)
+        recall = np.mean([len(truth[i] & set(found[i].tolist())) / len(truth[i]) for i in scored])
+        label = f"probes={probe}"
+        print(f"{label:>12} {recall:>8.3f} {ann_ms.mean():>8.2f} {np.percentile(ann_ms, 95):>8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recall@k vs. latency of approximate search.")
+    parser.add_argument("--domain", default="supply")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--sample", type=int, default=200, help="Extra queries sampled from chunks.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    report(args.domain, args.top_k, args.probes, args.sample, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+import config
+from build_process_rag import DEMAND_LIST_PATH, SUPPLY_LIST_PATH, _build_vector_index, _collect_docs, _load_url_list
+from tools import rag_search
+from tools.index_registry import REGISTRY, get_index
+from tools.query_cache import QueryCache
+
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+GOLDEN_PATH = BASE_DIR / "data" / "scm_golden_set.json"
+LIST_PATHS = {"supply": SUPPLY_LIST_PATH, "demand": DEMAND_LIST_PATH}
+
+
+def _queries(sample: int, seed: int, docs: List[dict]) -> List[str]:
+    golden = json.loads(GOLDEN_PATH.read_text(encoding="utf-8"))
+    queries = [row["query"] for row in golden if isinstance(row, dict)]
+    # Sampled from the documents, not the chunks, so every chunk size sees the same queries.
+    rng = random.Random(seed)
+    texts = [Path(doc["path"]).read_text(encoding="utf-8", errors="ignore").split() for doc in docs]
+    texts = [words for words in texts if len(words) > 8]
+    for _ in range(sample):
+        words = rng.choice(texts)
+        start = rng.randrange(len(words) - 8)
+        queries.append(" ".join(words[start : start + 8]))
+    return queries
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def report(domain: str, sizes: List[int], overlap: float, top_k: int, sample: int, seed: int) -> None:
+    docs = _collect_docs(_load_url_list(LIST_PATHS[domain]))
+    if not docs:
+        print(f"No processed documents for {domain}. Run: python process_data.py")
+        return
+    queries = _queries(sample, seed, docs)
+    # Time real scoring, not cache hits.
+    rag_search.CACHE = QueryCache(0, 0)
+    print(f"{domain}: {len(docs)} docs, {len(queries)} queries, top-{top_k}, overlap {overlap:.0%}")
+    print(f"{'words':>6} {'chunks':>7} {'index MB':>9} {'build s':>8} {'mean ms':>8} {'p95 ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        config.INDEX_CACHE_DIR = Path(tmp)
+        for size in sizes:
+            out_dir, _ = config.get_index_dirs(domain)
+            start = time.perf_counter()
+            _build_vector_index(
+                docs,
+                out_dir,
+                max_words=size,
+                min_words=round(size * 2 / 3),
+                overlap_words=round(size * overlap),
+            )
+            build_s = time.perf_counter() - start
+            REGISTRY.clear()
+            n_chunks = get_index(domain)["n_chunks"]
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                rag_search.search(query, top_k=top_k, domain=domain)
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies = np.asarray(latencies)
+            print(
+                f"{size:>6} {n_chunks:>7} {_dir_bytes(out_dir) / 2**20:>9.1f} {build_s:>8.1f} "
+                f"{latencies.mean():>8.2f} {np.percentile(latencies, 95):>8.2f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Index size and retrieval latency across chunk sizes.")
+    parser.add_argument("--domain", default="supply", choices=sorted(LIST_PATHS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 600, 900, 1200])
+    parser.add_argument("--overlap", type=float, default=0.0, help="Overlap as a fraction of chunk size.")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--sample", type=int, default=200, help="Extra queries sampled from documents.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    report(args.domain, args.sizes, args.overlap, args.top_k, args.sample, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
+import argparse
 import json
+import time
 from pathlib import Path
 from typing import Dict, List
 
+import config
 from agent.engine import run_agent
+from tools import rag_search
+from tools.query_cache import QueryCache
 
 
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -44,5 +49,56 @@ def evaluate() -> None:
     print(f"Routing accuracy: {routing_correct / total:.2%}")
 
 
-if __name__ == "__main__":
+def _timed_search(query: str, top_k: int, domain: str, doc_candidates: int) -> tuple[List[str], float]:
+    config.RAG_DOC_CANDIDATES = doc_candidates
+    start = time.perf_counter()
+    results = rag_search.search(query, top_k=top_k, domain=domain)
+    elapsed = (time.perf_counter() - start) * 1000
+    return [r["chunk_id"] for r in results if r["score"] > 0], elapsed
+
+
+def evaluate_retrieval(doc_candidates: int, top_k: int = 3) -> None:
+    golden = _load_golden()
+    saved_candidates, saved_cache = config.RAG_DOC_CANDIDATES, rag_search.CACHE
+    # Time real scoring, not cache hits; both settings are put back for the evaluation that follows.
+    rag_search.CACHE = QueryCache(0, 0)
+    try:
+        for domain in ("supply", "demand"):
+            if not config.index_exists(domain):
+                continue
+            overlaps = []
+            flat_ms = []
+            staged_ms = []
+            for row in golden:
+                flat, flat_elapsed = _timed_search(row["query"], top_k, domain, 0)
+                staged, staged_elapsed = _timed_search(row["query"], top_k, domain, doc_candidates)
+                flat_ms.append(flat_elapsed)
+                staged_ms.append(staged_elapsed)
+                if flat:
+                    overlaps.append(len(set(flat) & set(staged)) / len(flat))
+            overlap = sum(overlaps) / len(overlaps) if overlaps else 0.0
+            print(
+                f"{domain}: top-{top_k} overlap with flat search {overlap:.2%}, "
+                f"flat {sum(flat_ms) / len(flat_ms):.2f} ms, "
+                f"two-stage ({doc_candidates} docs) {sum(staged_ms) / len(staged_ms):.2f} ms"
+            )
+    finally:
+        config.RAG_DOC_CANDIDATES, rag_search.CACHE = saved_candidates, saved_cache
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluate the SCM agent on the golden set.")
+    parser.add_argument(
+        "--doc-candidates",
+        type=int,
+        default=config.RAG_DOC_CANDIDATES,
+        help="Use two-stage retrieval over the N best documents and compare it with flat search.",
+    )
+    args = parser.parse_args()
+    if args.doc_candidates > 0:
+        evaluate_retrieval(args.doc_candidates)
     evaluate()
+
+
+if __name__ == "__main__":
+    main()
@@ -42,6 +42,49 @@ const renderMarkdown = (text) => {
   return window.marked.parse(text, { breaks: true });
 };
 
+// Reads a text/event-stream response, calling onEvent(event, data) for each event.
+const readEvents = async (response, onEvent) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) return;
+    buffer += decoder.decode(value, { stream: true });
+    let end;
+    while ((end = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      let event = "message";
+      const data = [];
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data.push(line.slice(5).trim());
+      }
+      onEvent(event, JSON.parse(data.join("\n") || "{}"));
+    }
+  }
+};
+
+function SourceList({ sources }) {
+  if (!sources || sources.length === 0) return null;
+  return (
+    <div className="sources">
+      Sources
+      <ul>
+        {sources.map((src, idx) => (
+          <li key={`${src.source}-${idx}`}>
+            <a href={src.source} target="_blank" rel="noreferrer" title={src.source}>
+              {toDomain(src.source)}
+            </a>{" "}
+            (score={src.score?.toFixed?.(3) ?? src.score})
+          </li>
+        ))}
+      </ul>
+    </div>
+  );
+}
+
 function App() {
   const [sessions, setSessions] = useState(() => {
     const saved = loadSessions();
@@ -60,6 +103,7 @@ function App() {
   const [input, setInput] = useState("");
   const [topK, setTopK] = useState(3);
   const [loading, setLoading] = useState(false);
+  const [progress, setProgress] = useState(null);
   const [health, setHealth] = useState("checking");
 
   const suggestedPrompts = [
@@ -143,19 +187,30 @@ function App() {
 
     setInput("");
     setLoading(true);
+    setProgress(null);
 
     try {
-      const response = await fetch("/query", {
+      const response = await fetch("/query/stream", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ query: question, top_k: topK }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error("Request failed");
       }
 
-      const data = await response.json();
+      // Show sources and the answer as the server finds them, then keep the final result.
+      let data = null;
+      await readEvents(response, (event, payload) => {
+        if (event === "sources") setProgress({ text: "", sources: payload.sources });
+        else if (event === "answer") setProgress({ text: payload.answer, sources: payload.sources });
+        else if (event === "done") data = payload;
+        else if (event === "error") throw new Error(payload.detail);
+      });
+      if (!data) {
+        throw new Error("Stream ended early");
+      }
       const assistantMessage = {
         role: "assistant",
         text: data.answer || "",
@@ -178,6 +233,7 @@ function App() {
       }));
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
@@ -249,33 +305,24 @@ function App() {
                 ) : (
                   msg.text
                 )}
-                {msg.sources && msg.sources.length > 0 && (
-                  <div className="sources">
-                    Sources
-                    <ul>
-                      {msg.sources.map((src, idx) => (
-                        <li key={`${src.source}-${idx}`}>
-                          <a
-                            href={src.source}
-                            target="_blank"
-                            rel="noreferrer"
-                            title={src.source}
-                          >
-                            {toDomain(src.source)}
-                          </a>{" "}
-                          (score={src.score?.toFixed?.(3) ?? src.score})
-                        </li>
-                      ))}
-                    </ul>
-                  </div>
-                )}
+                <SourceList sources={msg.sources} />
               </div>
             </div>
           ))}
           {loading && (
             <div className="message-row assistant">
               <div className="avatar" />
-              <div className="card assistant">응답 생성 중...</div>
+              <div className="card assistant">
+                {progress?.text ? (
+                  <div
+                    className="markdown"
+                    dangerouslySetInnerHTML={{ __html: renderMarkdown(progress.text) }}
+                  />
+                ) : (
+                  "응답 생성 중..."
+                )}
+                <SourceList sources={progress?.sources} />
+              </div>
             </div>
           )}
         </section>
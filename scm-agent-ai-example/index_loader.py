@@ -1,12 +1,15 @@
+import json
 import os
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
 
 import shutil
 
 import boto3
+from botocore.exceptions import ClientError
 
-from config import BASE_DIR, INDEX_CACHE_DIR
+from config import INDEX_DIR_NAMES, INDEX_FILES, get_index_dirs
+from tools.index_store import META_FILE
 
 
 def _s3_client():
@@ -32,40 +35,64 @@ def _copy_local_if_missing(source: Path, dest: Path) -> bool:
     return True
 
 
+def _has_index(index_dir: Path) -> bool:
+    return any((index_dir / filename).exists() for filename in INDEX_FILES)
+
+
+def _index_file_list(meta_path: Path) -> List[str]:
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    return [name for name in meta.get("files", []) if name != META_FILE]
+
+
+def _copy_local_index(source_dir: Path, dest_dir: Path) -> None:
+    meta_path = source_dir / META_FILE
+    if not meta_path.exists():
+        _copy_local_if_missing(source_dir / "index.pkl", dest_dir / "index.pkl")
+        return
+    # meta.json is copied last so a half-copied directory is never picked up as an index.
+    for name in _index_file_list(meta_path):
+        _copy_local_if_missing(source_dir / name, dest_dir / name)
+    _copy_local_if_missing(meta_path, dest_dir / META_FILE)
+
+
+def _download_index(bucket: str, prefix: str, dest_dir: Path, pickle_key: str) -> None:
+    meta_path = dest_dir / META_FILE
+    staged_meta = dest_dir / f"{META_FILE}.download"
+    try:
+        _download_if_missing(bucket, f"{prefix}/{META_FILE}", staged_meta)
+    except ClientError:
+        _download_if_missing(bucket, pickle_key, dest_dir / "index.pkl")
+        return
+    for name in _index_file_list(staged_meta):
+        _download_if_missing(bucket, f"{prefix}/{name}", dest_dir / name)
+    os.replace(staged_meta, meta_path)
+
+
 def ensure_indexes() -> Dict[str, str]:
+    domains = [domain for domain in INDEX_DIR_NAMES if domain]
     bucket = os.getenv("INDEX_BUCKET", "").strip()
     if not bucket:
-        supply_src = BASE_DIR / "storage" / "vector_db_supply" / "index.pkl"
-        demand_src = BASE_DIR / "storage" / "vector_db_demand" / "index.pkl"
-        supply_dest = INDEX_CACHE_DIR / "vector_db_supply" / "index.pkl"
-        demand_dest = INDEX_CACHE_DIR / "vector_db_demand" / "index.pkl"
-        supply_state = "cached" if supply_dest.exists() else "copied"
-        demand_state = "cached" if demand_dest.exists() else "copied"
-        if supply_state == "copied":
-            _copy_local_if_missing(supply_src, supply_dest)
-        if demand_state == "copied":
-            _copy_local_if_missing(demand_src, demand_dest)
-        return {"supply": supply_state, "demand": demand_state}
+        results = {}
+        for domain in domains:
+            cache_dir, storage_dir = get_index_dirs(domain)
+            if _has_index(cache_dir):
+                results[domain] = "cached"
+                continue
+            results[domain] = "copied"
+            _copy_local_index(storage_dir, cache_dir)
+        return results
 
     prefix = os.getenv("INDEX_PREFIX", "scm-agent-ai-example/indexes").strip().strip("/")
-    supply_key = os.getenv(
-        "INDEX_SUPPLY_KEY", f"{prefix}/vector_db_supply/index.pkl"
-    ).strip()
-    demand_key = os.getenv(
-        "INDEX_DEMAND_KEY", f"{prefix}/vector_db_demand/index.pkl"
-    ).strip()
-
-    supply_dest = INDEX_CACHE_DIR / "vector_db_supply" / "index.pkl"
-    demand_dest = INDEX_CACHE_DIR / "vector_db_demand" / "index.pkl"
-
-    results = {
-        "supply": "cached" if supply_dest.exists() else "downloaded",
-        "demand": "cached" if demand_dest.exists() else "downloaded",
-    }
-
-    if results["supply"] == "downloaded":
-        _download_if_missing(bucket, supply_key, supply_dest)
-    if results["demand"] == "downloaded":
-        _download_if_missing(bucket, demand_key, demand_dest)
-
+    results = {}
+    for domain in domains:
+        cache_dir, _ = get_index_dirs(domain)
+        if _has_index(cache_dir):
+            results[domain] = "cached"
+            continue
+        results[domain] = "downloaded"
+        dir_name = INDEX_DIR_NAMES[domain]
+        pickle_key = os.getenv(
+            f"INDEX_{domain.upper()}_KEY", f"{prefix}/{dir_name}/index.pkl"
+        ).strip()
+        _download_index(bucket, f"{prefix}/{dir_name}", cache_dir, pickle_key)
     return results
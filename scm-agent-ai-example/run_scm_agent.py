@@ -1,8 +1,8 @@
 import argparse
 import sys
-from pathlib import Path
 
 from agent.engine import run_agent
+from config import index_exists
 
 
 def main() -> int:
@@ -10,9 +10,7 @@ def main() -> int:
     parser.add_argument("query", nargs="*", help="Query to the SCM agent.")
     args = parser.parse_args()
 
-    base_dir = Path(__file__).resolve().parent
-    index_path = base_dir / "storage" / "vector_db" / "index.pkl"
-    if not index_path.exists():
+    if not index_exists():
         print("Knowledge base not found. Run: python build_kb.py")
         return 1
 
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+from agent import engine
+from agent.prompts import ANSWER_TEMPLATE
+from build_process_rag import _build_vector_index
+from tools.run_logger import RunLogger
+
+
+DOCS = [
+    {"id": "doc_s", "source": "s.pdf", "text": "Supplier lead time variability raises procurement risk. Dual sourcing helps."},
+    {"id": "doc_w", "source": "w.pdf", "text": "Warehouse slotting cuts picking travel. Logistics teams review it weekly."},
+]
+
+RESULTS_HTML = (
+    '<a class="result__a" href="https://example.com/tower">Control towers</a>'
+    '<a class="result__snippet">A control tower gives end-to-end visibility.</a>'
+)
+
+
+def _serve_results(monkeypatch, delay):
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            time.sleep(delay)
+            body = RESULTS_HTML.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(config, "WEB_SEARCH_URL", f"http://127.0.0.1:{server.server_port}/html/")
+    return server, requests
+
+
+def _logged(tmp_path):
+    engine.RUN_LOGGER.close()
+    return [json.loads(line) for line in (tmp_path / "runs.jsonl").read_text().splitlines()]
+
+
+def _use_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "INDEX_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(config, "BASE_DIR", tmp_path)
+    monkeypatch.setattr(engine, "RUN_LOGGER", RunLogger(tmp_path / "runs.jsonl"))
+    _build_vector_index(DOCS, tmp_path / "vector_db_supply")
+
+
+def test_arun_agent_serves_concurrent_queries_like_run_agent(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+    queries = ["dual sourcing for procurement", "how do suppliers handle procurement risk", "best pizza in town"]
+
+    async def run_all():
+        return await asyncio.gather(*(engine.arun_agent(q) for q in queries))
+
+    concurrent = asyncio.run(run_all())
+    assert concurrent == [engine.run_agent(q) for q in queries]
+    assert concurrent[0]["sources"][0]["chunk_id"] == "doc_s_chunk_0"
+    assert "Dual sourcing helps." in concurrent[0]["answer"]
+    assert "only answer SCM-related" in concurrent[2]["answer"]
+    logged = _logged(tmp_path)
+    assert len(logged) == 4
+    assert {"lookup", "route", "search", "rerank", "select", "format", "total"} <= set(logged[0]["spans"])
+
+
+def test_hedged_web_search_answers_a_rag_miss(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+    server, requests = _serve_results(monkeypatch, delay=0.2)
+    try:
+        result = engine.run_agent("scm control tower rollout")
+    finally:
+        server.shutdown()
+    assert "A control tower gives end-to-end visibility." in result["answer"]
+    assert result["sources"][0]["source"] == "https://example.com/tower"
+    assert len(requests) == 1
+    assert _logged(tmp_path)[0]["web_hedge"] == "used"
+
+
+def test_hedged_web_search_is_cancelled_when_rag_answers(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+    server, _ = _serve_results(monkeypatch, delay=2.0)
+    try:
+        start = time.perf_counter()
+        result = engine.run_agent("scm dual sourcing")
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+    assert result["sources"][0]["chunk_id"] == "doc_s_chunk_0"
+    assert elapsed < 1.0
+    assert _logged(tmp_path)[0]["web_hedge"] == "cancelled"
+
+
+def test_deadline_returns_degraded_answer_instead_of_waiting_for_the_web(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+    server, _ = _serve_results(monkeypatch, delay=2.0)
+    try:
+        start = time.perf_counter()
+        result = engine.run_agent("scm control tower rollout", deadline_ms=300)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+    assert elapsed < 1.0
+    assert result["degraded"]
+    assert all(source["chunk_id"].startswith("doc_") for source in result["sources"])
+    logged = _logged(tmp_path)[0]
+    assert logged["degraded"] and logged["deadline_ms"] == 300
+
+
+def test_batch_scores_rag_queries_together_and_keeps_order(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+    calls = []
+    asearch_many = engine.asearch_many
+
+    async def counting(queries, top_k, domain):
+        calls.append(list(queries))
+        return await asearch_many(queries, top_k, domain)
+
+    monkeypatch.setattr(engine, "asearch_many", counting)
+    queries = ["dual sourcing for procurement", "best pizza in town", "how do suppliers handle procurement risk"]
+    results = asyncio.run(engine.arun_agent_batch([{"query": q} for q in queries]))
+    assert calls == [[queries[0], queries[2]]]
+    # Flushed before returning; the guard-rejected query is not logged.
+    assert len((tmp_path / "runs.jsonl").read_text().splitlines()) == 2
+    assert results == [engine.run_agent(q) for q in queries]
+
+
+def test_batch_flush_never_leaves_a_run_waiting(monkeypatch):
+    async def stalled(queries, top_k, domain):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(engine, "asearch_many", stalled)
+
+    async def run():
+        batch = engine._SearchBatch(2)
+        searches = [asyncio.create_task(batch.search(q)) for q in ("dual sourcing", "supplier risk")]
+        await asyncio.sleep(0)
+        # The batch holds its own reference to the flush task.
+        (flush,) = batch._flushes
+        flush.cancel()
+        outcomes = await asyncio.wait_for(asyncio.gather(*searches, return_exceptions=True), 1)
+        await asyncio.sleep(0)
+        return outcomes, batch._flushes
+
+    outcomes, flushes = asyncio.run(run())
+    assert all(isinstance(outcome, asyncio.CancelledError) for outcome in outcomes)
+    assert not flushes
+
+    async def broken_grouping():
+        batch = engine._SearchBatch(1)
+        # An unhashable domain fails while grouping, outside the per-group error handling.
+        return await asyncio.wait_for(batch.search("dual sourcing", domain=["supply"]), 1)
+
+    try:
+        asyncio.run(broken_grouping())
+    except TypeError as exc:
+        assert "unhashable" in str(exc)
+    else:
+        raise AssertionError("expected the batched search to fail")
+
+
+def test_stream_yields_route_sources_and_answer_before_the_result(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+
+    async def collect(query):
+        return [event async for event in engine.astream_agent(query)]
+
+    events = asyncio.run(collect("dual sourcing for procurement"))
+    assert [name for name, _ in events] == ["route", "sources", "answer", "done"]
+    assert events[0][1]["intent"] == events[3][1]["domain"]
+    assert events[1][1]["sources"][0]["chunk_id"] == "doc_s_chunk_0"
+    assert events[2][1]["answer"] == events[3][1]["answer"]
+    assert events[3][1] == engine.run_agent("dual sourcing for procurement")
+
+    events = asyncio.run(collect("best pizza in town"))
+    assert [name for name, _ in events] == ["route", "done"]
+
+    # The built-in overrides change the intent after routing; the route event reports the final one.
+    for query, intent in [("define safety stock", "INVENTORY"), ("calculate demand forecast error", "PLANNING")]:
+        events = dict(asyncio.run(collect(query)))
+        assert events["route"]["intent"] == events["done"]["domain"] == intent
+
+
+def test_response_table_prerenders_definitions_and_rebuilds():
+    entry = {"term": "OTIF", "definition": "On time in full.", "business_meaning": "Service level.", "formula": "x"}
+    table = engine.ResponseTable()
+    table.build([entry])
+    key = ("dictionary", "OTIF")
+    answer = engine._to_markdown("OTIF: On time in full.\nBusiness meaning: Service level.\nFormula: x")
+    assert table.get(key)["answer"] == answer
+    assert table.formatted(key, "DEFINITION", 0.9) == ANSWER_TEMPLATE.format(
+        answer=answer,
+        sources="- data/scm_dictionary.json (score=1.000)",
+        confidence=0.9,
+        domain="DEFINITION",
+    )
+
+    table.build([dict(entry, definition="Delivered on time and complete.")])
+    assert "Delivered on time and complete." in table.get(key)["answer"]
+    assert "Delivered on time and complete." in table.formatted(key, "DEFINITION", 0.9)
+
+
+def test_terms_inside_a_query_do_not_override_routing(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+    assert "OTIF = 0.874" in engine.run_agent("Calculate OTIF")["answer"]
+    assert "Warehouse Slotting:" in engine.run_agent("Warehouse slotting definition")["answer"]
+    assert "Lead Time Variability:" in engine.run_agent("supplier lead time variability in procurement")["answer"]
+    assert "OTIF:" in engine.run_agent("Define OTIF for executives")["answer"]
+    engine.run_agent("How to reduce lead time in procurement")
+    engine.run_agent("OTIF improvement plan for logistics")
+    assert [run["tool_calls"][0] for run in _logged(tmp_path)[-2:]] == ["rag_search", "rag_search"]
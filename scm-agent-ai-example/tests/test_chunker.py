@@ -0,0 +1,30 @@
+from tools.chunker import chunk_file, chunk_text
+
+
+def test_chunks_end_on_sentences_and_overlap_whole_sentences():
+    text = " ".join(f"Sentence {i} has five words." for i in range(10))
+    chunks = list(chunk_text(text, max_words=12, min_words=6, overlap_words=5))
+    assert [c["text"] for c in chunks[:2]] == [
+        "Sentence 0 has five words. Sentence 1 has five words.",
+        "Sentence 1 has five words. Sentence 2 has five words.",
+    ]
+    assert all(c["text"].endswith(".") for c in chunks)
+
+    # Without sentence ends the old fixed windows come back.
+    words = [f"w{i}" for i in range(25)]
+    assert [c["text"] for c in chunk_text(" ".join(words), max_words=10, min_words=6)] == [
+        " ".join(words[0:10]),
+        " ".join(words[10:20]),
+        " ".join(words[20:25]),
+    ]
+
+
+def test_chunk_offsets_point_into_the_source_file(tmp_path):
+    path = tmp_path / "doc.txt"
+    pages = ["재고 회전율은 중요하다. Safety stock buffers demand.", "Page two starts here and keeps going"]
+    path.write_bytes("\n\n".join(pages).encode("utf-8"))
+    chunks = list(chunk_file(path, max_words=9, min_words=2))
+    assert [c["text"] for c in chunks] == pages
+    raw = path.read_bytes()
+    for chunk in chunks:
+        assert raw[chunk["start"] : chunk["end"]].decode("utf-8") == chunk["text"]
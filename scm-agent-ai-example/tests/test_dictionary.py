@@ -1,4 +1,8 @@
-from tools.dictionary_lookup import lookup
+import json
+import os
+
+from agent.router import route
+from tools.dictionary_lookup import DictionaryStore, lookup, span_lookup
 
 
 def test_dictionary_lookup_term():
@@ -10,3 +14,39 @@ def test_dictionary_lookup_term():
 def test_dictionary_lookup_synonym():
     results, related = lookup("on time in full")
     assert results
+
+
+def test_dictionary_store_reloads_only_on_content_change(tmp_path):
+    path = tmp_path / "dictionary.json"
+    path.write_text(json.dumps([{"term": "OTIF", "synonyms": ["on time in full"]}]), encoding="utf-8")
+    store = DictionaryStore(path)
+    reloaded = []
+    store.on_reload(reloaded.append)
+    first = store.snapshot()
+    assert store.snapshot() is first
+    assert first.index == {"otif": "OTIF", "on time in full": "OTIF"}
+
+    # Same bytes with a new mtime: nothing is re-parsed.
+    os.utime(path, ns=(first.version[0] + 10**9, first.version[0] + 10**9))
+    assert store.snapshot().entries is first.entries
+
+    path.write_text(json.dumps([{"term": "Fill Rate"}, {"term": "OTIF"}]), encoding="utf-8")
+    os.utime(path, ns=(first.version[0] + 2 * 10**9, first.version[0] + 2 * 10**9))
+    assert store.snapshot().positions == {"Fill Rate": [0], "OTIF": [1]}
+    assert store.reloads == 1 and reloaded == [store.snapshot().entries]
+
+
+def test_lookup_keeps_terms_inside_a_longer_query_out_of_routing():
+    assert lookup("Calculate OTIF")[1] == []
+    assert lookup("How to reduce lead time in procurement")[1] == []
+    assert lookup("OTIF improvement plan for logistics")[1] == []
+    assert lookup("supplier lead time variability in procurement")[1] == ["Lead Time Variability"]
+    assert route("Calculate OTIF", [])["intent"] == "CALCULATION"
+    assert route("EOQ sensitivity", lookup("EOQ sensitivity")[1])["intent"] == "CALCULATION"
+    assert span_lookup("Define OTIF for executives")[1] == ["OTIF"]
+
+
+def test_lookup_lists_the_whole_query_match_first():
+    results, related = lookup("Warehouse slotting definition")
+    assert related[0] == "Warehouse Slotting"
+    assert results[0]["term"] == "Warehouse Slotting"
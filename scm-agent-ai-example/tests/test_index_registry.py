@@ -0,0 +1,45 @@
+import os
+
+import config
+from build_process_rag import _build_vector_index
+from tools.index_registry import IndexRegistry
+
+
+DOCS = [
+    {"id": "doc_a", "source": "a.pdf", "text": "Supplier lead time and procurement risk in logistics."},
+    {"id": "doc_b", "source": "b.pdf", "text": "Demand forecast accuracy with MAPE and bias tracking."},
+]
+
+
+def _build(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "INDEX_CACHE_DIR", tmp_path)
+    _build_vector_index(DOCS, tmp_path / "vector_db_supply")
+    _build_vector_index(DOCS, tmp_path / "vector_db_demand")
+
+
+def test_registry_loads_once(tmp_path, monkeypatch):
+    _build(tmp_path, monkeypatch)
+    registry = IndexRegistry(budget_bytes=10 * 1024 * 1024)
+    first = registry.get("supply")
+    assert registry.get("supply") is first
+    assert registry.stats()["loads"] == 1
+
+
+def test_registry_reloads_on_change(tmp_path, monkeypatch):
+    _build(tmp_path, monkeypatch)
+    registry = IndexRegistry(budget_bytes=10 * 1024 * 1024)
+    first = registry.get("supply")
+    index_path = config.get_index_path("supply")
+    stat = index_path.stat()
+    os.utime(index_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert registry.get("supply") is not first
+
+
+def test_registry_evicts_lru_over_budget(tmp_path, monkeypatch):
+    _build(tmp_path, monkeypatch)
+    registry = IndexRegistry(budget_bytes=1)
+    registry.get("supply")
+    registry.get("demand")
+    stats = registry.stats()
+    assert stats["resident"] == ["demand"]
+    assert stats["evictions"] == 1
@@ -0,0 +1,42 @@
+import pickle
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from tools.index_store import load_index, write_index
+
+
+CHUNKS = [
+    {"chunk_id": "a_chunk_0", "source": "a.pdf", "text": "Supplier lead time drives safety stock.", "page_text": ""},
+    {"chunk_id": "b_chunk_0", "source": "b.pdf", "text": "Forecast bias and MAPE — 수요예측 정확도.", "page_text": "page"},
+]
+
+
+def test_index_round_trip_is_memory_mapped(tmp_path):
+    vectorizer = TfidfVectorizer(stop_words="english")
+    matrix = vectorizer.fit_transform([c["text"] for c in CHUNKS])
+    write_index(tmp_path, vectorizer, matrix, CHUNKS)
+
+    index = load_index(tmp_path)
+    shard = index["shards"][0]["matrix"]
+    assert not shard.data.flags.owndata and not shard.data.flags.writeable
+    assert (shard != matrix).nnz == 0
+    assert [index["chunks"][i] for i in range(len(CHUNKS))] == CHUNKS
+
+    query = ["supplier safety stock forecast"]
+    assert (index["vectorizer"].transform(query) != vectorizer.transform(query)).nnz == 0
+    pickle.dumps(index["vectorizer"])
+
+
+def test_text_store_keeps_one_copy_of_repeated_page_text(tmp_path):
+    page = "Page text shared by every chunk cut from this page. " * 20
+    chunks = [
+        {"chunk_id": f"p_chunk_{i}", "source": "p.pdf", "text": f"chunk {i} of the page", "page_text": page}
+        for i in range(5)
+    ]
+    vectorizer = TfidfVectorizer(stop_words="english")
+    matrix = vectorizer.fit_transform([c["text"] for c in chunks])
+    write_index(tmp_path, vectorizer, matrix, chunks)
+
+    assert (tmp_path / "texts.bin").stat().st_size < 2 * len(page.encode("utf-8"))
+    index = load_index(tmp_path)
+    assert [index["chunks"][i] for i in range(5)] == chunks
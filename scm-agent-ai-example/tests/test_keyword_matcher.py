@@ -0,0 +1,23 @@
+import random
+
+from agent.keywords import KEYWORDS, MATCHER, SCM_KEYWORDS, keyword_hits
+from agent.router import route
+from tools.keyword_matcher import KeywordMatcher
+
+
+def test_matcher_finds_every_substring_hit():
+    matcher = KeywordMatcher({"a": ["he", "she", "his", "hers"], "b": ["her", "s"]})
+    assert matcher.find("ushers") == {"he", "she", "hers", "her", "s"}
+
+    rng = random.Random(0)
+    words = MATCHER.keywords + ["the", "plan", "재", "x"]
+    for _ in range(500):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(0, 6)))
+        assert MATCHER.find(text) == {word for word in MATCHER.keywords if word in text}
+
+
+def test_duplicate_keywords_keep_their_weight():
+    hits = keyword_hits("S&OP cycle")
+    assert hits[("intent", "PLANNING")] == KEYWORDS["PLANNING"].count("s&op") == 2
+    assert hits[("guard", "scm")] == SCM_KEYWORDS.count("s&op")
+    assert route("S&OP cycle", [])["confidence"] == min(0.95, 0.3 + 0.3 + 0.4)
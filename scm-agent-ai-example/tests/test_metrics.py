@@ -0,0 +1,22 @@
+from tools.metrics import Histogram, Trace
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency.", "stage", (0.01, 0.1))
+    for value in (0.005, 0.01, 0.05, 2.0):
+        histogram.observe("search", value)
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{stage="search",le="0.01"} 2' in lines
+    assert 'latency_seconds_bucket{stage="search",le="0.1"} 3' in lines
+    assert 'latency_seconds_bucket{stage="search",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{stage="search"} 4' in lines
+
+
+def test_trace_accumulates_repeated_stages():
+    trace = Trace()
+    trace.record("search", 0.002)
+    trace.record("search", 0.003)
+    with trace.span("format"):
+        pass
+    assert trace.spans["search"] == 5.0
+    assert set(trace.spans) == {"search", "format"}
@@ -0,0 +1,19 @@
+from tools.query_cache import QueryCache
+
+
+def test_query_cache_evicts_least_recently_used():
+    cache = QueryCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", [{"chunk_id": "a"}])
+    cache.put("b", [{"chunk_id": "b"}])
+    assert cache.get("a") == [{"chunk_id": "a"}]
+    cache.put("c", [{"chunk_id": "c"}])
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 1)
+
+
+def test_query_cache_expires_entries():
+    cache = QueryCache(max_entries=2, ttl_seconds=0)
+    cache.put("a", [])
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
@@ -0,0 +1,111 @@
+import config
+from build_process_rag import _build_vector_index
+from tools import rag_search
+from tools.query_cache import QueryCache
+from tools.rag_search import search, search_many
+
+
+DOCS = [
+    {"id": "doc_a", "source": "a.pdf", "text": "Supplier lead time variability raises procurement risk."},
+    {"id": "doc_b", "source": "b.pdf", "text": "Demand forecast accuracy is tracked with MAPE and bias."},
+    {"id": "doc_c", "source": "c.pdf", "text": "Safety stock buffers demand variability over the lead time."},
+]
+
+
+def _use_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "INDEX_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(config, "BASE_DIR", tmp_path)
+    _build_vector_index(DOCS, tmp_path / "vector_db_supply")
+
+
+def test_search_many_matches_search(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+    queries = ["lead time variability", "forecast bias", "nothing relevant here"]
+    batched = search_many(queries, top_k=2, domain="supply")
+    assert len(batched) == len(queries)
+    for query, results in zip(queries, batched):
+        single = search(query, top_k=2, domain="supply")
+        assert [r["chunk_id"] for r in results] == [r["chunk_id"] for r in single]
+        assert [round(r["score"], 9) for r in results] == [round(r["score"], 9) for r in single]
+
+
+def test_search_fans_out_across_domains(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+    demand_docs = [{"id": "doc_d", "source": "d.pdf", "text": "S&OP aligns the demand plan with supply capacity."}]
+    _build_vector_index(demand_docs, tmp_path / "vector_db_demand")
+
+    results = search("demand plan and supplier lead time", top_k=4)
+    assert {r["domain"] for r in results} == {"supply", "demand"}
+    assert results[0]["norm_score"] == 1.0
+    assert search_many(["demand plan and supplier lead time"], top_k=4)[0] == results
+
+
+def test_fan_out_ranks_hits_on_raw_cosine_across_indexes(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+    demand_docs = [{"id": "doc_d", "source": "d.pdf", "text": "Delivery time is reviewed in the monthly plan."}]
+    _build_vector_index(demand_docs, tmp_path / "vector_db_demand")
+
+    results = search("supplier lead time variability safety stock", top_k=3)
+    # A weak demand hit no longer outranks stronger supply hits, and zero-score padding is dropped.
+    assert [r["domain"] for r in results] == ["supply", "supply", "demand"]
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+    assert all(r["score"] > 0 for r in results)
+
+
+def test_fan_out_skips_a_domain_whose_index_fails_to_load(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+    (tmp_path / "vector_db_demand").mkdir()
+    (tmp_path / "vector_db_demand" / "index.pkl").write_bytes(b"version https://git-lfs.github.com/spec/v1\n")
+
+    results = search("supplier lead time", top_k=2)
+    assert [r["chunk_id"] for r in results] == ["doc_a_chunk_0", "doc_c_chunk_0"]
+    assert {r["domain"] for r in results} == {"supply"}
+    assert search_many(["supplier lead time"], top_k=2)[0] == results
+
+
+def test_search_cache_invalidates_on_index_change(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+    monkeypatch.setattr(rag_search, "CACHE", QueryCache(max_entries=8, ttl_seconds=60))
+
+    first = search("Forecast  BIAS", top_k=2, domain="supply")
+    assert search("forecast bias", top_k=2, domain="supply") == first
+    assert rag_search.CACHE.stats()["hits"] == 1
+
+    _build_vector_index(DOCS[:2], tmp_path / "vector_db_supply")
+    search("forecast bias", top_k=2, domain="supply")
+    assert rag_search.CACHE.stats()["misses"] == 2
+
+
+def test_sharded_index_matches_single_shard(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+    _build_vector_index(DOCS, tmp_path / "vector_db_demand", shards=2)
+    for query in ("lead time variability", "forecast bias", "nothing relevant here"):
+        single = search(query, top_k=3, domain="supply")
+        sharded = search(query, top_k=3, domain="demand")
+        assert [r["chunk_id"] for r in sharded] == [r["chunk_id"] for r in single]
+    queries = ["lead time", "safety stock"]
+    assert [[r["chunk_id"] for r in rs] for rs in search_many(queries, 3, "demand")] == [
+        [r["chunk_id"] for r in rs] for rs in search_many(queries, 3, "supply")
+    ]
+
+
+def test_two_stage_search_over_all_documents_matches_flat(tmp_path, monkeypatch):
+    _use_index(tmp_path, monkeypatch)
+    flat = search("demand variability lead time", top_k=2, domain="supply")
+    monkeypatch.setattr(config, "RAG_DOC_CANDIDATES", len(DOCS))
+    staged = search("demand variability lead time", top_k=2, domain="supply")
+    assert [r["chunk_id"] for r in staged] == [r["chunk_id"] for r in flat]
+
+
+def test_sources_cite_the_byte_range_of_the_hit(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "INDEX_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(config, "BASE_DIR", tmp_path)
+    path = tmp_path / "doc_p.txt"
+    pages = ["재고 회전율은 중요하다. Safety stock buffers demand.", "Supplier lead time drives procurement risk."]
+    path.write_bytes("\n\n".join(pages).encode("utf-8"))
+    doc = {"id": "doc_p", "source": "p.pdf", "path": str(path)}
+    _build_vector_index([doc], tmp_path / "vector_db_supply", max_words=9, min_words=2)
+
+    hit = search("supplier lead time", top_k=1, domain="supply")[0]
+    start, end = hit["offsets"]
+    assert path.read_bytes()[start:end].decode("utf-8") == hit["text"] == pages[1]
@@ -0,0 +1,60 @@
+import time
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import config
+from tools.index_store import load_index, write_index
+from tools.rag_search import _to_results
+from tools.rerank import bm25f_scores, rerank
+
+
+CANDIDATES = [
+    {"chunk_id": "a", "score": 0.9, "text": "Suppliers ship pallets. Risk reviews happen yearly."},
+    {"chunk_id": "b", "score": 0.5, "text": "Weather delays trucks. Supplier risk scoring ranks vendors."},
+    {"chunk_id": "c", "score": 0.4, "text": "Warehouse slotting reduces travel time."},
+]
+
+
+def test_rerank_promotes_sentence_with_adjacent_terms(monkeypatch):
+    monkeypatch.setattr(config, "RERANKER", "bm25f")
+    monkeypatch.setattr(config, "RERANK_BUDGET_MS", 10_000)
+    results, stats = rerank("supplier risk scoring", CANDIDATES, top_k=2)
+    assert [r["chunk_id"] for r in results] == ["b", "a"]
+    assert stats["applied"] and stats["candidates"] == 3
+
+
+def test_rerank_falls_back_to_first_pass_order(monkeypatch):
+    monkeypatch.setattr(config, "RERANKER", "bm25f")
+    # A deadline already in the past.
+    monkeypatch.setattr(config, "RERANK_BUDGET_MS", -1)
+    results, stats = rerank("supplier risk scoring", CANDIDATES, top_k=2)
+    assert [r["chunk_id"] for r in results] == ["a", "b"]
+    assert stats["budget_exceeded"] and not stats["applied"]
+
+    # The request deadline shortens the budget too.
+    monkeypatch.setattr(config, "RERANK_BUDGET_MS", 10_000)
+    results, stats = rerank("supplier risk scoring", CANDIDATES, top_k=2, deadline=time.perf_counter() - 1)
+    assert [r["chunk_id"] for r in results] == ["a", "b"]
+    assert stats["budget_exceeded"]
+
+    monkeypatch.setattr(config, "RERANKER", "none")
+    results, stats = rerank("supplier risk scoring", CANDIDATES, top_k=2)
+    assert [r["chunk_id"] for r in results] == ["a", "b"]
+    assert not stats["budget_exceeded"]
+
+
+def test_precomputed_sentences_score_like_the_text(tmp_path):
+    chunks = [dict(c, source="x.pdf") for c in CANDIDATES]
+    # Repeated terms, odd whitespace, a page text that is not the chunk's, and a chunk with no tokens.
+    text = "Risk risk supplier.\n\nSupplier  scoring!"
+    chunks.append({"chunk_id": "d", "source": "y.pdf", "text": text, "page_text": "P."})
+    chunks.append({"chunk_id": "e", "source": "y.pdf", "text": "...", "page_text": "P."})
+    vectorizer = TfidfVectorizer()
+    write_index(tmp_path, vectorizer, vectorizer.fit_transform([c["text"] for c in chunks]), chunks)
+    sources = _to_results(load_index(tmp_path)["chunks"], range(len(chunks)), [0.1] * len(chunks))
+    assert all(s["sentences"].term_matches(["risk"]) is not None for s in sources)
+
+    for terms in (["supplier", "risk", "scoring"], ["risk"], ["travel", "nothing"]):
+        precomputed = bm25f_scores(terms, sources, time.perf_counter() + 60)
+        legacy = bm25f_scores(terms, [dict(s, sentences=None) for s in sources], time.perf_counter() + 60)
+        assert precomputed == legacy
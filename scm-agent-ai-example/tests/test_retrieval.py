@@ -0,0 +1,46 @@
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from tools.ann import ann_top_k, build_ann
+from tools.retrieval import build_postings, top_k_scores
+
+
+TEXTS = [
+    "supplier lead time variability and procurement risk",
+    "demand forecast accuracy measured with mape and bias",
+    "safety stock buffers demand variability over lead time",
+    "warehouse slotting and pick path design",
+    "forecast bias in sales and operations planning",
+]
+
+
+def _dense_top_k(vectorizer, matrix, query, top_k):
+    scores = cosine_similarity(vectorizer.transform([query]), matrix).flatten()
+    ranked = scores.argsort(kind="stable")[::-1][:top_k]
+    return ranked, scores[ranked]
+
+
+def test_postings_ranking_matches_dense_cosine():
+    vectorizer = TfidfVectorizer(stop_words="english")
+    matrix = vectorizer.fit_transform(TEXTS)
+    postings = build_postings(matrix)
+    for query in ("lead time variability", "forecast bias", "warehouse", "unrelated words"):
+        expected_ids, expected_scores = _dense_top_k(vectorizer, matrix, query, top_k=4)
+        ids, scores = top_k_scores(vectorizer.transform([query]), postings, top_k=4)
+        assert list(ids) == list(expected_ids)
+        assert np.allclose(scores, expected_scores)
+
+
+def test_ann_with_every_cluster_probed_is_exact():
+    vectorizer = TfidfVectorizer(stop_words="english")
+    matrix = vectorizer.fit_transform(TEXTS)
+    index = {
+        "shards": [{"offset": 0, "matrix": matrix, "postings": build_postings(matrix)}],
+        "n_chunks": matrix.shape[0],
+        "ann": build_ann(matrix, dims=3, clusters=2),
+    }
+    query_vec = vectorizer.transform(["demand variability lead time"])
+    expected_ids, _ = top_k_scores(query_vec, index["shards"][0]["postings"], top_k=2)
+    ids, _ = ann_top_k(query_vec, index, top_k=2, probes=2)
+    assert list(ids) == list(expected_ids)
@@ -0,0 +1,70 @@
+import json
+import os
+import threading
+import time
+
+from tools.run_logger import RunLogger
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    logger = RunLogger(tmp_path / "runs.jsonl", max_queue=2, batch_size=1, flush_seconds=0)
+    release = threading.Event()
+    write = logger._write
+
+    def slow_write(payloads):
+        release.wait()
+        write(payloads)
+
+    logger._write = slow_write
+    logger.log({"n": 0})
+    while logger._queue.qsize():
+        time.sleep(0.001)
+    accepted = [logger.log({"n": n}) for n in range(1, 6)]
+    assert accepted == [True, True, False, False, False]
+    release.set()
+    logger.close()
+    assert [row["n"] for row in _lines(tmp_path / "runs.jsonl")] == [0, 1, 2]
+    assert logger.stats()["dropped"] == 3
+
+
+def test_rotates_by_size_and_date(tmp_path):
+    path = tmp_path / "runs.jsonl"
+    logger = RunLogger(path, batch_size=1, max_bytes=30, backups=2)
+    for n in range(4):
+        logger.log({"n": n, "pad": "x" * 8})
+        logger.flush()
+    assert logger.stats()["rotations"] == 3
+    assert len(list(tmp_path.glob("runs.*.jsonl"))) == 2
+    assert _lines(path) == [{"n": 3, "pad": "xxxxxxxx"}]
+
+    yesterday = time.time() - 86400
+    os.utime(path, (yesterday, yesterday))
+    logger.max_bytes, logger.backups = 0, 10
+    logger.log({"n": 4})
+    logger.close()
+    day = time.strftime("%Y-%m-%d", time.localtime(yesterday))
+    assert _lines(tmp_path / f"runs.{day}.1.jsonl") == [{"n": 3, "pad": "xxxxxxxx"}]
+    assert _lines(path) == [{"n": 4}]
+
+
+def test_rotation_of_a_file_moved_away_still_writes_the_batch(tmp_path, monkeypatch):
+    path = tmp_path / "runs.jsonl"
+    path.write_text('{"n": 0}\n')
+    logger = RunLogger(path, batch_size=1, max_bytes=10)
+    replace = os.replace
+
+    def rotated_elsewhere(src, dst):
+        # Another writer rotates the file between our stat() and our rename.
+        replace(src, tmp_path / "other.jsonl")
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", rotated_elsewhere)
+    logger.log({"n": 1})
+    logger.close()
+    assert logger.stats()["errors"] == 0 and logger.stats()["rotations"] == 0
+    assert _lines(path) == [{"n": 1}]
+    assert _lines(tmp_path / "other.jsonl") == [{"n": 0}]
@@ -0,0 +1,25 @@
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from agent.engine import _select_indexed_sentences, _select_relevant_sentences
+from tools.index_store import load_index, write_index
+from tools.rag_search import _to_results
+
+
+PAGE = "Lead time drives safety stock.  Forecast bias hurts\nservice!   Suppliers ship weekly. ..."
+CHUNKS = [
+    {"chunk_id": "p_chunk_0", "source": "p.pdf", "text": "lead time", "page_text": PAGE},
+    {"chunk_id": "p_chunk_1", "source": "p.pdf", "text": "forecast", "page_text": PAGE},
+    {"chunk_id": "q_chunk_0", "source": "q.pdf", "text": "Reorder point uses lead time demand. " * 80},
+]
+
+
+def test_indexed_sentences_match_plain_extraction(tmp_path):
+    vectorizer = TfidfVectorizer()
+    write_index(tmp_path, vectorizer, vectorizer.fit_transform([c["text"] for c in CHUNKS]), CHUNKS)
+    index = load_index(tmp_path)
+    sources = _to_results(index["chunks"], [0, 1, 2], [0.3, 0.2, 0.1])
+
+    for query in ("lead time safety stock", "forecast service", "reorder lead time demand", "nothing"):
+        context = " ".join(s["page_text"] or s["text"] for s in sources)[:2000]
+        assert _select_indexed_sentences(query, sources) == _select_relevant_sentences(query, context)
+    assert _select_indexed_sentences("lead time", [dict(sources[0], sentences=None)]) is None
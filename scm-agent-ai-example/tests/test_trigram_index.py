@@ -0,0 +1,52 @@
+import random
+from difflib import get_close_matches
+
+from tools.dictionary_lookup import DICTIONARY, span_lookup
+from tools.trigram_index import TrigramIndex
+
+
+KEYS = ["otif", "on time in full", "safety stock", "safety stock factor", "reorder point", "안전재고", "수요예측"]
+
+
+def test_close_matches_agree_with_difflib():
+    index = TrigramIndex(KEYS)
+    for query in ["safety stok", "reorder pont", "otif", "on-time in full", "안전재구", "forecast"]:
+        assert index.close_matches(query, n=3) == get_close_matches(query, KEYS, n=3, cutoff=0.6)
+
+
+def test_span_matches_find_terms_inside_a_query():
+    index = TrigramIndex(KEYS)
+    assert index.close_matches("what is otif for execs") == []
+    assert index.span_matches("what is otif for execs") == ["otif"]
+    assert index.span_matches("how to size saftey stock buffers") == ["safety stock"]
+    assert index.span_matches("안전재고 계산 방법") == ["안전재고"]
+    assert span_lookup("Define OTIF for executives")[1] == ["OTIF"]
+
+
+def test_close_matches_agree_with_difflib_on_typos():
+    keys = list(DICTIONARY.snapshot().index)
+    index = TrigramIndex(keys)
+    rng = random.Random(7)
+    for key in keys:
+        for _ in range(4):
+            chars = list(key)
+            pos = rng.randrange(len(chars))
+            edit = rng.randrange(3)
+            if edit == 0 and len(chars) > 1:
+                del chars[pos]
+            elif edit == 1:
+                chars.insert(pos, rng.choice("abcdefghijklmnopqrstuvwxyz &-"))
+            elif pos + 1 < len(chars):
+                chars[pos], chars[pos + 1] = chars[pos + 1], chars[pos]
+            query = "".join(chars)
+            assert index.close_matches(query, n=5) == get_close_matches(query, keys, n=5, cutoff=0.6), query
+    assert index.close_matches("bsrop", n=5) == get_close_matches("bsrop", keys, n=5, cutoff=0.6)
+
+
+def test_length_band_and_character_bound_keep_every_difflib_match():
+    rng = random.Random(11)
+    keys = sorted({"".join(rng.choice("abcdefgh ") for _ in range(rng.randint(1, 14))) for _ in range(500)})
+    index = TrigramIndex(keys)
+    for query in [rng.choice(keys)[: rng.randint(1, 14)] + rng.choice("abcdefgh") for _ in range(100)]:
+        for cutoff in (0.6, 0.8):
+            assert index.close_matches(query, n=5, cutoff=cutoff) == get_close_matches(query, keys, n=5, cutoff=cutoff)
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+from tools import web_search
+from tools.http_pool import HttpPool
+
+
+RESULTS_HTML = (
+    '<div class="result"><a class="result__a" href="//duckduckgo.com/l/?uddg=https%3A%2F%2Fexample.com%2Fotif">'
+    "OTIF <b>explained</b></a>"
+    '<a class="result__snippet" href="#">On time &amp; in full.</a></div>'
+    '<div class="result"><a class="result__a" href="https://example.org/fill">Fill rate</a>'
+    '<a class="result__snippet" href="#">Share of demand shipped.</a></div>'
+)
+
+
+def _serve(monkeypatch, delay=0.0):
+    # Stand-in for the DuckDuckGo HTML endpoint; records the client port of each request.
+    seen = {"ports": [], "active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            with lock:
+                seen["ports"].append(self.client_address[1])
+                seen["active"] += 1
+                seen["peak"] = max(seen["peak"], seen["active"])
+            time.sleep(delay)
+            body = RESULTS_HTML.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with lock:
+                seen["active"] -= 1
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(config, "WEB_SEARCH_URL", f"http://127.0.0.1:{server.server_port}/html/")
+    return server, seen
+
+
+def test_web_search_reuses_one_connection(monkeypatch):
+    server, seen = _serve(monkeypatch)
+    pool = HttpPool(pool_size=4, per_host=4, keepalive_seconds=30, headers={})
+    monkeypatch.setattr(web_search, "POOL", pool)
+
+    try:
+        results = [web_search.web_search("otif", max_results=2) for _ in range(3)]
+        # Each asyncio.run() is a new event loop, as in run_agent.
+        async_results = [asyncio.run(web_search.aweb_search("otif")) for _ in range(3)]
+    finally:
+        pool.close()
+        server.shutdown()
+    assert results[0] == [
+        {"url": "https://example.com/otif", "title": "OTIF explained", "snippet": "On time & in full.", "score": 1.0},
+        {"url": "https://example.org/fill", "title": "Fill rate", "snippet": "Share of demand shipped.", "score": 1.0},
+    ]
+    assert async_results == results
+    # Sync calls and every event loop share one kept-alive connection.
+    assert len(seen["ports"]) == 6
+    assert len(set(seen["ports"])) == 1
+
+
+def test_per_host_limit_caps_concurrent_requests(monkeypatch):
+    server, seen = _serve(monkeypatch, delay=0.1)
+    pool = HttpPool(pool_size=8, per_host=2, keepalive_seconds=30, headers={})
+    monkeypatch.setattr(web_search, "POOL", pool)
+    # The limit holds across threads and event loops alike.
+    threads = [threading.Thread(target=web_search.web_search, args=("otif",)) for _ in range(3)]
+    threads += [threading.Thread(target=asyncio.run, args=(web_search.aweb_search("otif"),)) for _ in range(3)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        pool.close()
+        server.shutdown()
+    assert len(seen["ports"]) == 6
+    assert seen["peak"] == 2
+
+
+def test_timeout_covers_waiting_for_a_host_slot(monkeypatch):
+    server, seen = _serve(monkeypatch, delay=0.5)
+    pool = HttpPool(pool_size=8, per_host=1, keepalive_seconds=30, headers={})
+    monkeypatch.setattr(web_search, "POOL", pool)
+
+    async def run():
+        first = asyncio.create_task(web_search.aweb_search("otif", timeout=2.0))
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        # Queued behind the first request's slot; gives up at its own timeout instead of waiting.
+        queued = await web_search.aweb_search("otif", timeout=0.2)
+        waited = time.perf_counter() - start
+        return await first, queued, waited
+
+    try:
+        # Opens the connection, so the timings below are only queueing.
+        web_search.web_search("otif")
+        first, queued, waited = asyncio.run(run())
+        start = time.perf_counter()
+        thread = threading.Thread(target=web_search.web_search, args=("otif",), kwargs={"timeout": 2.0})
+        thread.start()
+        time.sleep(0.05)
+        sync_queued = web_search.web_search("otif", timeout=0.2)
+        sync_waited = time.perf_counter() - start
+        thread.join()
+    finally:
+        pool.close()
+        server.shutdown()
+    assert first and queued == [] and sync_queued == []
+    assert waited < 0.35 and sync_waited < 0.4
@@ -0,0 +1,60 @@
+import math
+from typing import Dict, Tuple
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+from tools.retrieval import rescore, select_top_k
+
+
+ANN_ARRAY_FILES = {
+    "components": "ann_components.npy",
+    "centroids": "ann_centroids.npy",
+    "list_ptr": "ann_list_ptr.npy",
+    "list_docs": "ann_list_docs.npy",
+}
+
+
+def build_ann(matrix, dims: int = 128, clusters: int = 0, seed: int = 0) -> Dict[str, np.ndarray]:
+    n_rows, n_terms = matrix.shape
+    dims = max(1, min(dims, n_rows - 1, n_terms - 1))
+    clusters = clusters or round(math.sqrt(n_rows))
+    clusters = max(1, min(clusters, n_rows))
+
+    svd = TruncatedSVD(n_components=dims, random_state=seed)
+    embedded = normalize(svd.fit_transform(matrix))
+    kmeans = MiniBatchKMeans(n_clusters=clusters, random_state=seed, n_init=3)
+    labels = kmeans.fit_predict(embedded)
+
+    # Inverted lists: the chunk ids of each cluster, stored CSR-style.
+    order = np.argsort(labels, kind="stable")
+    counts = np.bincount(labels, minlength=clusters)
+    return {
+        # Stored term-major (terms x dims) so projecting a query reads one contiguous row per term.
+        "components": np.ascontiguousarray(svd.components_.T, dtype=np.float32),
+        "centroids": normalize(kmeans.cluster_centers_).astype(np.float32),
+        "list_ptr": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        "list_docs": order.astype(np.int64),
+    }
+
+
+def ann_candidates(query_vec, ann: Dict[str, np.ndarray], probes: int) -> np.ndarray:
+    query_vec = query_vec.tocsr()
+    # Gather only the query's term rows; a full sparse @ dense product would copy the projection.
+    projected = query_vec.data @ ann["components"][query_vec.indices]
+    norm = np.linalg.norm(projected)
+    if norm == 0:
+        return np.empty(0, dtype=np.int64)
+    similarity = ann["centroids"] @ (projected / norm)
+    probes = min(probes, len(similarity))
+    nearest = np.argpartition(-similarity, probes - 1)[:probes]
+    lists = [ann["list_docs"][ann["list_ptr"][c] : ann["list_ptr"][c + 1]] for c in nearest]
+    return np.sort(np.concatenate(lists))
+
+
+def ann_top_k(query_vec, index: Dict, top_k: int, probes: int) -> Tuple[np.ndarray, np.ndarray]:
+    candidates = ann_candidates(query_vec, index["ann"], probes)
+    doc_ids, scores = rescore(query_vec, index["shards"], candidates)
+    return select_top_k(doc_ids, scores, top_k, index["n_chunks"])
@@ -0,0 +1,94 @@
+import io
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+WORD = re.compile(r"\S+")
+SENTENCE_END = (".", "!", "?")
+# Boundary after a word: none, end of sentence, end of page (a blank line).
+NONE, SENTENCE, PAGE = 0, 1, 2
+
+Word = Tuple[str, int, int, int]
+
+
+def _words(lines: Iterable[str]) -> Iterator[Word]:
+    # (word, start byte, end byte, boundary after it), read one line at a time.
+    offset = 0
+    pending = None
+    for line in lines:
+        size = len(line.encode("utf-8"))
+        if not line.strip():
+            if pending is not None:
+                pending = pending[:3] + (PAGE,)
+            offset += size
+            continue
+        char_pos, byte_pos = 0, offset
+        for match in WORD.finditer(line):
+            if pending is not None:
+                yield pending
+            byte_pos += len(line[char_pos : match.start()].encode("utf-8"))
+            end = byte_pos + len(match.group().encode("utf-8"))
+            word = match.group()
+            pending = (word, byte_pos, end, SENTENCE if word.endswith(SENTENCE_END) else NONE)
+            char_pos, byte_pos = match.end(), end
+        offset += size
+    if pending is not None:
+        yield pending[:3] + (PAGE,)
+
+
+def _cut(window: List[Word], min_words: int) -> int:
+    # Latest page end at or past min_words, else the latest sentence end, else a hard cut.
+    sentence_cut = 0
+    for i in range(len(window) - 1, min_words - 2, -1):
+        if window[i][3] == PAGE:
+            return i + 1
+        if window[i][3] == SENTENCE and not sentence_cut:
+            sentence_cut = i + 1
+    return sentence_cut or len(window)
+
+
+def _overlap_start(window: List[Word], cut: int, overlap_words: int) -> int:
+    # Step back overlap_words, then forward to the first sentence start so overlap is whole sentences.
+    start = cut - overlap_words
+    for i in range(start - 1, cut - 1):
+        if window[i][3] != NONE:
+            return i + 1
+    return start
+
+
+def _chunk(words: List[Word]) -> Dict:
+    return {"text": " ".join(w[0] for w in words), "start": words[0][1], "end": words[-1][2]}
+
+
+def iter_chunks(
+    lines: Iterable[str], max_words: int = 900, min_words: int = 600, overlap_words: int = 0
+) -> Iterator[Dict]:
+    # Yields {"text", "start", "end"}; start/end are UTF-8 byte offsets into the source.
+    max_words = max(1, max_words)
+    min_words = max(1, min(min_words, max_words))
+    overlap_words = max(0, min(overlap_words, min_words - 1))
+    window: List[Word] = []
+    fresh = 0
+    for word in _words(lines):
+        window.append(word)
+        fresh += 1
+        if len(window) < max_words:
+            continue
+        cut = _cut(window, min_words)
+        yield _chunk(window[:cut])
+        start = _overlap_start(window, cut, overlap_words) if overlap_words else cut
+        fresh = len(window) - cut
+        window = window[start:]
+    if fresh:
+        yield _chunk(window)
+
+
+def chunk_text(text: str, **kwargs) -> Iterator[Dict]:
+    return iter_chunks(io.StringIO(text), **kwargs)
+
+
+def chunk_file(path: Path, **kwargs) -> Iterator[Dict]:
+    # newline="" keeps line endings as stored, so byte offsets line up with the file.
+    with path.open(encoding="utf-8", errors="ignore", newline="") as f:
+        yield from iter_chunks(f, **kwargs)
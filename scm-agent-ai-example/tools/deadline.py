@@ -0,0 +1,22 @@
+import time
+from typing import Optional
+
+
+# A deadline is an absolute time.perf_counter() value; None means the request has no deadline.
+
+
+def deadline_after(ms: Optional[float]) -> Optional[float]:
+    if ms is None or ms <= 0:
+        return None
+    return time.perf_counter() + ms / 1000
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    # Seconds left, never negative; None when there is no deadline.
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.perf_counter())
+
+
+def expired(deadline: Optional[float]) -> bool:
+    return deadline is not None and time.perf_counter() >= deadline
@@ -1,15 +1,18 @@
+import asyncio
+import hashlib
 import json
-from difflib import get_close_matches
+import threading
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from tools.trigram_index import TrigramIndex
 
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 DICT_PATH = BASE_DIR / "data" / "scm_dictionary.json"
 
 
-def _load_dictionary() -> List[Dict]:
-    raw = DICT_PATH.read_text(encoding="utf-8")
+def _parse_dictionary(raw: str) -> List[Dict]:
     try:
         data = json.loads(raw)
         return data if isinstance(data, list) else []
@@ -62,20 +65,102 @@ def _build_index(entries: List[Dict]) -> Dict[str, str]:
     return index
 
 
+class DictionarySnapshot(NamedTuple):
+    version: Tuple[int, int]
+    digest: str
+    entries: List[Dict]
+    # Lower-cased term or synonym -> canonical term.
+    index: Dict[str, str]
+    trigrams: TrigramIndex
+    # Canonical term -> positions of its entries in the file.
+    positions: Dict[str, List[int]]
+
+
+class DictionaryStore:
+    # Parses the dictionary once and keeps its index resident; a changed file is re-read on the next call.
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._snapshot: Optional[DictionarySnapshot] = None
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[List[Dict]], None]] = []
+        self.reloads = 0
+
+    def on_reload(self, listener: Callable[[List[Dict]], None]) -> None:
+        self._listeners.append(listener)
+
+    def snapshot(self) -> DictionarySnapshot:
+        stat = self.path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == version:
+                return snapshot
+            raw = self.path.read_bytes()
+            digest = hashlib.sha1(raw).hexdigest()
+            if snapshot is not None and snapshot.digest == digest:
+                # Touched but unchanged: keep the parsed data.
+                self._snapshot = snapshot._replace(version=version)
+                return self._snapshot
+            entries = _parse_dictionary(raw.decode("utf-8"))
+            index = _build_index(entries)
+            positions: Dict[str, List[int]] = {}
+            for pos, entry in enumerate(entries):
+                positions.setdefault(entry.get("term"), []).append(pos)
+            # Readers hold on to whichever snapshot they got; a reload never changes one in place.
+            self._snapshot = DictionarySnapshot(version, digest, entries, index, TrigramIndex(list(index)), positions)
+            reloaded = snapshot is not None
+            if reloaded:
+                self.reloads += 1
+        if reloaded:
+            for listener in self._listeners:
+                listener(entries)
+        return self._snapshot
+
+
+DICTIONARY = DictionaryStore(DICT_PATH)
+
+
+def load_dictionary() -> List[Dict]:
+    return DICTIONARY.snapshot().entries
+
+
+def _entries(snapshot: DictionarySnapshot, terms: List[str]) -> List[Dict]:
+    # Entries in the order of the terms, each term's entries in file order.
+    return [snapshot.entries[pos] for term in terms for pos in snapshot.positions.get(term, [])]
+
+
 def lookup(query: str, top_k: int = 5) -> Tuple[List[Dict], List[str]]:
-    entries = _load_dictionary()
-    index = _build_index(entries)
+    snapshot = DICTIONARY.snapshot()
+    index = snapshot.index
     query_norm = query.strip().lower()
 
     related_terms = []
     if query_norm in index:
         related_terms.append(index[query_norm])
 
-    term_keys = list(index.keys())
-    fuzzy = get_close_matches(query_norm, term_keys, n=top_k, cutoff=0.6)
+    fuzzy = snapshot.trigrams.close_matches(query_norm, n=top_k, cutoff=0.6)
     for match in fuzzy:
         related_terms.append(index[match])
 
     related_terms = list(dict.fromkeys(related_terms))
-    results = [e for e in entries if e.get("term") in related_terms]
-    return results, related_terms
+    return _entries(snapshot, related_terms), related_terms
+
+
+def span_lookup(query: str, top_k: int = 5) -> Tuple[List[Dict], List[str]]:
+    # Terms named inside a longer query ("Define OTIF for executives"). Kept apart from lookup()
+    # so they never count as related terms when routing.
+    snapshot = DICTIONARY.snapshot()
+    matches = snapshot.trigrams.span_matches(query.strip().lower(), n=top_k)
+    terms = list(dict.fromkeys(snapshot.index[match] for match in matches))
+    return _entries(snapshot, terms), terms
+
+
+async def alookup(query: str, top_k: int = 5) -> Tuple[List[Dict], List[str]]:
+    return await asyncio.to_thread(lookup, query, top_k)
+
+
+async def aspan_lookup(query: str, top_k: int = 5) -> Tuple[List[Dict], List[str]]:
+    return await asyncio.to_thread(span_lookup, query, top_k)
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import urllib.parse
+from typing import Dict, Optional
+
+import httpx
+
+
+class HttpPool:
+    # Keep-alive connections shared by every request, thread and event loop in the process,
+    # with a cap on in-flight requests per host.
+    def __init__(self, pool_size: int, per_host: int, keepalive_seconds: float, headers: Dict[str, str]) -> None:
+        self.per_host = max(1, per_host)
+        self._limits = httpx.Limits(
+            max_connections=max(1, pool_size),
+            max_keepalive_connections=max(1, pool_size),
+            keepalive_expiry=keepalive_seconds,
+        )
+        self._headers = headers
+        self._lock = threading.Lock()
+        # httpx.AsyncClient and asyncio.Semaphore belong to one event loop. The pool runs its own on a
+        # background thread, so asyncio.run() callers (run_agent, the CLI, eval) and the API's loop all
+        # reuse the same connections and share the per-host limit.
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _running_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=self._serve, args=(loop,), name="http-pool", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    @staticmethod
+    def _serve(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+        loop.close()
+
+    async def _fetch(self, url: str, timeout: float) -> str:
+        # The timeout covers the wait for a per-host slot as well as the request, so a queue behind
+        # slow requests cannot outlast the caller's budget.
+        return await asyncio.wait_for(self._acquire_and_get(url, timeout), timeout)
+
+    async def _acquire_and_get(self, url: str, timeout: float) -> str:
+        # Runs on the pool's loop only.
+        if self._client is None:
+            self._client = httpx.AsyncClient(headers=self._headers, limits=self._limits, follow_redirects=True)
+        host = urllib.parse.urlsplit(url).netloc
+        slot = self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with slot:
+            resp = await self._client.get(url, timeout=timeout)
+            resp.raise_for_status()
+            return resp.content.decode("utf-8", errors="ignore")
+
+    def get(self, url: str, timeout: float) -> str:
+        future = asyncio.run_coroutine_threadsafe(self._fetch(url, timeout), self._running_loop())
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    async def aget(self, url: str, timeout: float) -> str:
+        # Cancelling the caller cancels the request on the pool's loop too.
+        future = asyncio.run_coroutine_threadsafe(self._fetch(url, timeout), self._running_loop())
+        return await asyncio.wrap_future(future)
+
+    async def _close_client(self) -> None:
+        client, self._client = self._client, None
+        self._host_slots = {}
+        if client is not None:
+            await client.aclose()
+
+    def close(self) -> None:
+        # Closes the connections and stops the pool's loop; the next request starts a new one.
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._close_client(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    async def aclose(self) -> None:
+        await asyncio.to_thread(self.close)
@@ -0,0 +1,130 @@
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import config
+from tools.index_store import META_FILE, load_index, resident_nbytes
+from tools.retrieval import with_shards
+
+
+def _resolve_index_path(domain: Optional[str] = None) -> Path:
+    index_path = config.get_index_path(domain)
+    if index_path.exists():
+        return index_path
+    if domain:
+        raise FileNotFoundError(
+            f"Vector index missing for {domain}. Run: python build_process_rag.py"
+        )
+    for fallback in ("supply", "demand"):
+        fallback_path = config.get_index_path(fallback)
+        if fallback_path.exists():
+            return fallback_path
+    raise FileNotFoundError("Vector index missing. Run: python build_process_rag.py")
+
+
+def _file_version(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _load_index_file(path: Path) -> Tuple[Dict, int]:
+    if path.name == META_FILE:
+        return load_index(path.parent), resident_nbytes(path.parent)
+    with path.open("rb") as f:
+        index = pickle.load(f)
+    # Legacy pickles carry no postings; build them once here (roughly doubling the resident size).
+    return with_shards(index), path.stat().st_size * 2
+
+
+class IndexRegistry:
+    def __init__(self, budget_bytes: int) -> None:
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, domain: Optional[str] = None) -> Dict:
+        key = domain or "default"
+        path = _resolve_index_path(domain)
+        version = _file_version(path)
+        with self._lock:
+            index = self._lookup(key, path, version)
+            if index is not None:
+                return index
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # One loader per domain; concurrent callers wait instead of unpickling twice.
+        with load_lock:
+            with self._lock:
+                index = self._lookup(key, path, version)
+                if index is not None:
+                    return index
+            index, nbytes = _load_index_file(path)
+            with self._lock:
+                self._entries[key] = {
+                    "index": index,
+                    "path": path,
+                    "version": version,
+                    "nbytes": nbytes,
+                }
+                self._entries.move_to_end(key)
+                self.loads += 1
+                self._evict()
+        return index
+
+    def version(self, domain: Optional[str] = None) -> Tuple[str, int, int]:
+        path = _resolve_index_path(domain)
+        return (str(path),) + _file_version(path)
+
+    def preload(self, domains: Iterable[Optional[str]]) -> Dict[str, bool]:
+        loaded = {}
+        for domain in domains:
+            try:
+                self.get(domain)
+                loaded[domain or "default"] = True
+            except FileNotFoundError:
+                loaded[domain or "default"] = False
+        return loaded
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "resident": list(self._entries.keys()),
+                "resident_bytes": sum(e["nbytes"] for e in self._entries.values()),
+                "budget_bytes": self.budget_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+    def _lookup(self, key: str, path: Path, version: Tuple[int, int]) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["path"] != path or entry["version"] != version:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry["index"]
+
+    def _evict(self) -> None:
+        # The most recently loaded index always stays resident, even if it alone exceeds the budget.
+        total = sum(e["nbytes"] for e in self._entries.values())
+        while total > self.budget_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry["nbytes"]
+            self.evictions += 1
+
+
+REGISTRY = IndexRegistry(config.INDEX_MEMORY_BUDGET_MB * 1024 * 1024)
+
+
+def get_index(domain: Optional[str] = None) -> Dict:
+    return REGISTRY.get(domain)
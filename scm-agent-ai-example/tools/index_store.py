@@ -0,0 +1,318 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from tools.ann import ANN_ARRAY_FILES
+from tools.retrieval import build_doc_matrix
+from tools.sentence_index import (
+    SENTENCE_ARRAY_FILES,
+    SENTENCE_VOCAB_FILE,
+    TEXT_SENTENCE_ARRAY_FILES,
+    SentenceIndex,
+    SentenceRef,
+    build_sentence_index,
+    context_text,
+)
+from tools.text_store import TextStore, write_text_store
+
+
+FORMAT_VERSION = 4
+META_FILE = "meta.json"
+VOCAB_FILE = "vocab.txt"
+CHUNKS_FILE = "chunks.json"
+TEXTS_FILE = "texts.bin"
+ARRAY_FILES = {
+    "idf": "idf.npy",
+    "text_spans": "text_spans.npy",
+}
+DOC_ARRAY_FILES = {
+    "data": "doc_data.npy",
+    "indices": "doc_indices.npy",
+    "indptr": "doc_indptr.npy",
+    "postings_data": "doc_postings_data.npy",
+    "postings_docs": "doc_postings_docs.npy",
+    "postings_ptr": "doc_postings_ptr.npy",
+    "chunk_ptr": "doc_chunk_ptr.npy",
+}
+SHARD_ARRAY_FILES = {
+    "data": "data.npy",
+    "indices": "indices.npy",
+    "indptr": "indptr.npy",
+    "postings_data": "postings_data.npy",
+    "postings_docs": "postings_docs.npy",
+    "postings_ptr": "postings_ptr.npy",
+}
+VECTORIZER_PARAMS = (
+    "analyzer",
+    "binary",
+    "lowercase",
+    "ngram_range",
+    "norm",
+    "smooth_idf",
+    "stop_words",
+    "strip_accents",
+    "sublinear_tf",
+    "token_pattern",
+    "use_idf",
+)
+
+
+class ChunkTable:
+    # Only ids, sources and source offsets are resident; text and page_text are read from the store per hit.
+    def __init__(self, meta: List[list], texts: TextStore, sentences: Optional[SentenceIndex] = None) -> None:
+        self._meta = meta
+        self._texts = texts
+        self._sentences = sentences
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    def __getitem__(self, idx: int) -> Dict:
+        chunk_id, source = self._meta[idx][:2]
+        return {
+            "chunk_id": chunk_id,
+            "source": source,
+            "text": self._texts.get(2 * int(idx)),
+            "page_text": self._texts.get(2 * int(idx) + 1),
+        }
+
+    def location(self, idx: int) -> Optional[Tuple[str, int, int]]:
+        # (source text file, start byte, end byte) for chunks built from files, else None.
+        row = self._meta[idx]
+        return (row[2], row[3], row[4]) if len(row) == 5 else None
+
+    def sentence_ref(self, idx: int) -> Optional[SentenceRef]:
+        return SentenceRef(self._sentences, int(idx)) if self._sentences is not None else None
+
+
+def _replace_file(path: Path, write) -> None:
+    # Write beside the target and rename, so workers that still map the old file keep a valid inode.
+    tmp_path = path.with_name(path.name + ".tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _save_array(path: Path, array: np.ndarray) -> None:
+    def write(tmp_path: Path) -> None:
+        with tmp_path.open("wb") as f:
+            np.save(f, array)
+
+    _replace_file(path, write)
+
+
+def _save_text(path: Path, text: str) -> None:
+    _replace_file(path, lambda tmp_path: tmp_path.write_text(text, encoding="utf-8"))
+
+
+def _write_texts(path: Path, chunks: Sequence[Dict]) -> np.ndarray:
+    tmp_path = path.with_name(path.name + ".tmp")
+    fields = [chunk.get(field, "") for chunk in chunks for field in ("text", "page_text")]
+    spans = write_text_store(tmp_path, fields)
+    os.replace(tmp_path, path)
+    return spans
+
+
+def _chunk_row(chunk: Dict) -> list:
+    row = [chunk["chunk_id"], chunk["source"]]
+    if "offsets" in chunk:
+        row += [chunk["path"], *chunk["offsets"]]
+    return row
+
+
+def _shard_bounds(n_rows: int, shards: int) -> List[int]:
+    shards = max(1, min(shards, n_rows)) if n_rows else 1
+    return [round(i * n_rows / shards) for i in range(shards + 1)]
+
+
+def _matrix_arrays(matrix: csr_matrix) -> Dict[str, np.ndarray]:
+    postings = matrix.tocsc()
+    postings.sort_indices()
+    return {
+        "data": matrix.data,
+        "indices": matrix.indices,
+        "indptr": matrix.indptr,
+        "postings_data": postings.data,
+        "postings_docs": postings.indices,
+        "postings_ptr": postings.indptr,
+    }
+
+
+def _write_shard(shard_dir: Path, matrix: csr_matrix) -> List[str]:
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    arrays = _matrix_arrays(matrix)
+    for name, filename in SHARD_ARRAY_FILES.items():
+        _save_array(shard_dir / filename, arrays[name])
+    return [f"{shard_dir.name}/{filename}" for filename in SHARD_ARRAY_FILES.values()]
+
+
+def _write_docs(out_dir: Path, matrix: csr_matrix, doc_chunk_ptr: Sequence[int]) -> List[str]:
+    chunk_ptr = np.asarray(doc_chunk_ptr, dtype=np.int64)
+    arrays = _matrix_arrays(build_doc_matrix(matrix, chunk_ptr))
+    arrays["chunk_ptr"] = chunk_ptr
+    for name, filename in DOC_ARRAY_FILES.items():
+        _save_array(out_dir / filename, arrays[name])
+    return list(DOC_ARRAY_FILES.values())
+
+
+def _write_sentences(out_dir: Path, chunks: Sequence[Dict]) -> Tuple[int, int]:
+    terms, arrays, text_arrays = build_sentence_index(
+        (context_text(chunk) for chunk in chunks), (chunk.get("text", "") for chunk in chunks)
+    )
+    for name, filename in SENTENCE_ARRAY_FILES.items():
+        _save_array(out_dir / filename, arrays[name])
+    for name, filename in TEXT_SENTENCE_ARRAY_FILES.items():
+        _save_array(out_dir / filename, text_arrays[name])
+    _save_text(out_dir / SENTENCE_VOCAB_FILE, "\n".join(terms))
+    return len(arrays["spans"]), len(text_arrays["token_ptr"]) - 1
+
+
+def write_index(
+    out_dir: Path,
+    vectorizer: TfidfVectorizer,
+    matrix,
+    chunks: Sequence[Dict],
+    shards: int = 1,
+    ann: Optional[Dict[str, np.ndarray]] = None,
+    doc_chunk_ptr: Optional[Sequence[int]] = None,
+) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    matrix = csr_matrix(matrix)
+    matrix.sort_indices()
+
+    terms = [""] * len(vectorizer.vocabulary_)
+    for term, column in vectorizer.vocabulary_.items():
+        terms[column] = term
+    text_spans = _write_texts(out_dir / TEXTS_FILE, chunks)
+
+    arrays = {"idf": vectorizer.idf_, "text_spans": text_spans}
+    for name, filename in ARRAY_FILES.items():
+        _save_array(out_dir / filename, arrays[name])
+
+    # Shards are contiguous row blocks that share the vocabulary and IDF above.
+    shard_meta = []
+    shard_files: List[str] = []
+    bounds = _shard_bounds(matrix.shape[0], shards)
+    for number, (start, end) in enumerate(zip(bounds, bounds[1:])):
+        shard_dir = out_dir / f"shard_{number:03d}"
+        shard_files += _write_shard(shard_dir, matrix[start:end])
+        shard_meta.append({"dir": shard_dir.name, "offset": start, "rows": end - start})
+
+    ann_meta = None
+    ann_files: List[str] = []
+    if ann is not None:
+        for name, filename in ANN_ARRAY_FILES.items():
+            _save_array(out_dir / filename, ann[name])
+            ann_files.append(filename)
+        ann_meta = {"dims": int(ann["components"].shape[1]), "clusters": int(ann["centroids"].shape[0])}
+    _save_text(out_dir / VOCAB_FILE, "\n".join(terms))
+    _save_text(
+        out_dir / CHUNKS_FILE,
+        json.dumps([_chunk_row(c) for c in chunks], ensure_ascii=False),
+    )
+
+    # Optional document-level matrix for two-stage retrieval; docs own contiguous chunk ranges.
+    doc_files = _write_docs(out_dir, matrix, doc_chunk_ptr) if doc_chunk_ptr is not None else []
+    # Sentence boundaries and token ids of each chunk's context, for answer extraction, and the
+    # token sequence of each sentence of its text, for re-ranking.
+    n_sentences, n_text_sentences = _write_sentences(out_dir, chunks)
+    sentence_files = (
+        [SENTENCE_VOCAB_FILE] + list(SENTENCE_ARRAY_FILES.values()) + list(TEXT_SENTENCE_ARRAY_FILES.values())
+    )
+
+    params = vectorizer.get_params()
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "shape": list(matrix.shape),
+        "shards": shard_meta,
+        "ann": ann_meta,
+        "docs": {"count": len(doc_chunk_ptr) - 1} if doc_chunk_ptr is not None else None,
+        "sentences": {"count": n_sentences, "text_count": n_text_sentences},
+        "vectorizer": {name: params[name] for name in VECTORIZER_PARAMS},
+        "files": [META_FILE, VOCAB_FILE, CHUNKS_FILE, TEXTS_FILE] + list(ARRAY_FILES.values()) + shard_files + ann_files + doc_files + sentence_files,
+    }
+    # meta.json goes last: its mtime is the index version readers key on.
+    meta_path = out_dir / META_FILE
+    _save_text(meta_path, json.dumps(meta, indent=2))
+    return meta_path
+
+
+def _load_vectorizer(meta: Dict, vocab_path: Path, idf: np.ndarray) -> TfidfVectorizer:
+    params = dict(meta["vectorizer"])
+    params["ngram_range"] = tuple(params["ngram_range"])
+    vectorizer = TfidfVectorizer(**params)
+    terms = vocab_path.read_text(encoding="utf-8").split("\n") if idf.size else []
+    vectorizer.vocabulary_ = {term: column for column, term in enumerate(terms)}
+    vectorizer.idf_ = np.asarray(idf)
+    return vectorizer
+
+
+def _load_matrices(arrays: Dict[str, np.ndarray], shape: tuple) -> Dict:
+    matrix = csr_matrix(
+        (arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False
+    )
+    postings = csc_matrix(
+        (arrays["postings_data"], arrays["postings_docs"], arrays["postings_ptr"]),
+        shape=shape,
+        copy=False,
+    )
+    return {"matrix": matrix, "postings": postings}
+
+
+def _load_arrays(base_dir: Path, files: Dict[str, str]) -> Dict[str, np.ndarray]:
+    return {name: np.load(base_dir / filename, mmap_mode="r") for name, filename in files.items()}
+
+
+def _load_shard(index_dir: Path, shard: Dict, n_terms: int) -> Dict:
+    arrays = _load_arrays(index_dir / shard["dir"], SHARD_ARRAY_FILES)
+    loaded = _load_matrices(arrays, (shard["rows"], n_terms))
+    loaded["offset"] = shard["offset"]
+    return loaded
+
+
+def _load_docs(index_dir: Path, count: int, n_terms: int) -> Dict:
+    arrays = _load_arrays(index_dir, DOC_ARRAY_FILES)
+    loaded = _load_matrices(arrays, (count, n_terms))
+    loaded["chunk_ptr"] = arrays["chunk_ptr"]
+    return loaded
+
+
+def _load_sentences(index_dir: Path, meta: Dict) -> SentenceIndex:
+    terms_text = (index_dir / SENTENCE_VOCAB_FILE).read_text(encoding="utf-8")
+    # Written before re-ranking data existed: the re-ranker then re-splits the text.
+    text_arrays = _load_arrays(index_dir, TEXT_SENTENCE_ARRAY_FILES) if "text_count" in meta else None
+    return SentenceIndex(
+        terms_text.split("\n") if terms_text else [], _load_arrays(index_dir, SENTENCE_ARRAY_FILES), text_arrays
+    )
+
+
+def load_index(index_dir: Path) -> Dict:
+    meta = json.loads((index_dir / META_FILE).read_text(encoding="utf-8"))
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported index format in {index_dir}. Rebuild the index.")
+    arrays = _load_arrays(index_dir, ARRAY_FILES)
+    n_terms = meta["shape"][1]
+    chunk_meta = json.loads((index_dir / CHUNKS_FILE).read_text(encoding="utf-8"))
+    # Indexes written before sentence data existed still load; answer extraction then re-splits the text.
+    sentences = _load_sentences(index_dir, meta["sentences"]) if meta.get("sentences") else None
+    index = {
+        "vectorizer": _load_vectorizer(meta, index_dir / VOCAB_FILE, arrays["idf"]),
+        "shards": [_load_shard(index_dir, shard, n_terms) for shard in meta["shards"]],
+        "n_chunks": meta["shape"][0],
+        "chunks": ChunkTable(chunk_meta, TextStore(index_dir / TEXTS_FILE, arrays["text_spans"]), sentences),
+    }
+    if meta.get("ann"):
+        index["ann"] = _load_arrays(index_dir, ANN_ARRAY_FILES)
+    if meta.get("docs"):
+        index["docs"] = _load_docs(index_dir, meta["docs"]["count"], n_terms)
+    return index
+
+
+def resident_nbytes(index_dir: Path) -> int:
+    # Arrays are memory-mapped and shared through the page cache; only vocab and chunk ids live on the heap.
+    names = (META_FILE, VOCAB_FILE, CHUNKS_FILE, SENTENCE_VOCAB_FILE)
+    return sum((index_dir / name).stat().st_size for name in names if (index_dir / name).exists())
@@ -0,0 +1,67 @@
+from collections import Counter, deque
+from typing import Dict, Hashable, List, Set
+
+
+class KeywordMatcher:
+    # Aho-Corasick automaton over every keyword list: one pass over the text finds them all.
+    def __init__(self, keywords: Dict[Hashable, List[str]]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._outputs: List[List[int]] = [[]]
+        self._labels: List[List[Hashable]] = []
+        ids: Dict[str, int] = {}
+        for label, words in keywords.items():
+            for word in words:
+                if word not in ids:
+                    ids[word] = len(self._labels)
+                    self._labels.append([])
+                    self._add(word, ids[word])
+                # A keyword listed twice under one label counts twice, as separate checks would.
+                self._labels[ids[word]].append(label)
+        self.keywords = list(ids)
+        self._build_fail_links()
+
+    def _add(self, word: str, word_id: int) -> None:
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append(word_id)
+
+    def _build_fail_links(self) -> None:
+        # Fold the failure links into a full transition table, so matching never backtracks.
+        fail = [0] * len(self._goto)
+        self._delta: List[Dict[str, int]] = [dict(self._goto[0])] + [{} for _ in self._goto[1:]]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self._delta[state] = {**self._delta[fail[state]], **self._goto[state]}
+            for char, next_state in self._goto[state].items():
+                fail[next_state] = self._delta[fail[state]].get(char, 0) if state else 0
+                self._outputs[next_state] += self._outputs[fail[next_state]]
+                queue.append(next_state)
+
+    def _find_ids(self, text: str) -> Set[int]:
+        found: Set[int] = set()
+        state = 0
+        delta, outputs = self._delta, self._outputs
+        for char in text:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+    def find(self, text: str) -> Set[str]:
+        # Keywords that occur anywhere in text (substring semantics, like `word in text`).
+        return {self.keywords[word_id] for word_id in self._find_ids(text)}
+
+    def hits(self, text: str) -> Counter:
+        # Per label, how many of its listed keywords occur in text.
+        counts: Counter = Counter()
+        for word_id in self._find_ids(text):
+            counts.update(self._labels[word_id])
+        return counts
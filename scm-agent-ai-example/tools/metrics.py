@@ -0,0 +1,77 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+
+LATENCY_BUCKETS_SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    # Prometheus-style histogram with one label; rendered in the text exposition format.
+    def __init__(self, name: str, help_text: str, label: str, buckets: Tuple[float, ...]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float) -> None:
+        with self._lock:
+            # Per-bucket counts, then +Inf, then the sum of observed values.
+            series = self._series.setdefault(label_value, [0.0] * (len(self.buckets) + 2))
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        result = {}
+        for key, values in series.items():
+            counts = values[:-1]
+            cumulative = [sum(counts[: i + 1]) for i in range(len(counts))]
+            result[key] = {"buckets": cumulative, "count": cumulative[-1], "sum": values[-1]}
+        return result
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        for key, data in sorted(self.snapshot().items()):
+            label = f'{self.label}="{key}"'
+            for bound, count in zip(bounds, data["buckets"]):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {int(count)}')
+            lines.append(f"{self.name}_sum{{{label}}} {data['sum']:.6f}")
+            lines.append(f"{self.name}_count{{{label}}} {int(data['count'])}")
+        return lines
+
+
+STAGE_LATENCY = Histogram(
+    "scm_agent_stage_duration_seconds",
+    "Wall time of each run_agent stage.",
+    "stage",
+    LATENCY_BUCKETS_SECONDS,
+)
+
+
+class Trace:
+    # Stage timings of one run, in milliseconds, for the run log; each span also feeds STAGE_LATENCY.
+    def __init__(self) -> None:
+        self.spans: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.spans[stage] = round(self.spans.get(stage, 0.0) + seconds * 1000, 3)
+        STAGE_LATENCY.observe(stage, seconds)
+
+
+def render_metrics() -> str:
+    return "\n".join(STAGE_LATENCY.render()) + "\n"
@@ -1,48 +1,257 @@
-import pickle
-from typing import Dict, List, Optional
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
 
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
 
-from config import get_index_path
+import config
+from tools.ann import ann_top_k
+from tools.deadline import expired, remaining
+from tools.index_registry import REGISTRY, get_index
+from tools.query_cache import QueryCache, normalize_query
+from tools.retrieval import doc_top_k, merge_top_k, top_k_scores, top_k_scores_many
 
 
-def _load_index(domain: Optional[str] = None) -> Dict:
-    index_path = get_index_path(domain)
-    if not index_path.exists():
-        if domain:
-            raise FileNotFoundError(
-                f"Vector index missing for {domain}. Run: python build_process_rag.py"
+LOGGER = logging.getLogger(__name__)
+
+# Domain fan-out and shard scoring get separate pools: a domain task waits on its shard tasks,
+# so sharing one pool could deadlock once every worker is a waiting domain task.
+_EXECUTORS: Dict[str, ThreadPoolExecutor] = {}
+_EXECUTOR_LOCK = threading.Lock()
+CACHE = QueryCache(config.RAG_CACHE_SIZE, config.RAG_CACHE_TTL_SECONDS)
+
+# (index, ranked chunk ids, scores): a ranking whose text has not been read yet.
+Scored = Tuple[Dict, np.ndarray, np.ndarray]
+
+
+def _executor(kind: str = "domains") -> ThreadPoolExecutor:
+    with _EXECUTOR_LOCK:
+        if kind not in _EXECUTORS:
+            _EXECUTORS[kind] = ThreadPoolExecutor(
+                max_workers=max(1, config.RAG_SEARCH_WORKERS), thread_name_prefix=f"rag-{kind}"
             )
-        supply_path = get_index_path("supply")
-        demand_path = get_index_path("demand")
-        if supply_path.exists():
-            index_path = supply_path
-        elif demand_path.exists():
-            index_path = demand_path
-        else:
-            raise FileNotFoundError("Vector index missing. Run: python build_process_rag.py")
-    with index_path.open("rb") as f:
-        return pickle.load(f)
-
-
-def search(query: str, top_k: int = 3, domain: Optional[str] = None) -> List[Dict]:
-    index = _load_index(domain)
-    vectorizer = index["vectorizer"]
-    matrix = index["matrix"]
-    chunks = index["chunks"]
+        return _EXECUTORS[kind]
+
+
+def _map_shards(score, shards: List[Dict]) -> List:
+    if len(shards) == 1:
+        return [score(shards[0])]
+    futures = [_executor("shards").submit(score, shard) for shard in shards]
+    return [f.result() for f in futures]
 
-    query_vec = vectorizer.transform([query])
-    scores = cosine_similarity(query_vec, matrix).flatten()
-    ranked = scores.argsort()[::-1][:top_k]
+
+def _load_index(domain: Optional[str] = None) -> Dict:
+    return get_index(domain)
+
+
+def _to_results(chunks, ranked, scores) -> List[Dict]:
     results = []
-    for idx in ranked:
+    for idx, score in zip(ranked, scores):
+        chunk = chunks[idx]
         results.append(
             {
-                "chunk_id": chunks[idx]["chunk_id"],
-                "source": chunks[idx]["source"],
-                "score": float(scores[idx]),
-                "text": chunks[idx]["text"],
-                "page_text": chunks[idx].get("page_text", ""),
+                "chunk_id": chunk["chunk_id"],
+                "source": chunk["source"],
+                "score": float(score),
+                "text": chunk["text"],
+                "page_text": chunk.get("page_text", ""),
             }
         )
+        # Memory-mapped indexes carry precomputed sentences and source offsets; legacy pickles do not.
+        sentence_ref = getattr(chunks, "sentence_ref", None)
+        if sentence_ref is not None:
+            results[-1]["sentences"] = sentence_ref(idx)
+            location = chunks.location(idx)
+            if location is not None:
+                # Byte range of the hit in the source's processed text, cited with the source.
+                results[-1]["offsets"] = list(location[1:])
+    return results
+
+
+def _fanout_domains(domain: Optional[str]) -> List[Optional[str]]:
+    if domain is not None or not config.RAG_FANOUT:
+        return []
+    domains = config.available_domains()
+    return domains if len(domains) > 1 else []
+
+
+def _merge(per_domain: Dict[Optional[str], Scored], top_k: int) -> List[Dict]:
+    # Every index scores with L2-normalised TF-IDF cosine on the same [0, 1] scale, so raw scores
+    # compare across indexes. Zero scores are top_k padding, not matches.
+    candidates = []
+    for domain, (index, ranked, scores) in per_domain.items():
+        for idx, score in zip(ranked, scores):
+            if score > 0:
+                candidates.append((float(score), domain, index, idx))
+    candidates.sort(key=lambda c: c[0], reverse=True)
+
+    # Text is hydrated only for the hits that survive the merge.
+    merged = []
+    best = candidates[0][0] if candidates else 0.0
+    for score, domain, index, idx in candidates[:top_k]:
+        result = _to_results(index["chunks"], [idx], [score])[0]
+        result.update(domain=domain or "default", norm_score=score / best)
+        merged.append(result)
+    return merged
+
+
+def _finished(futures: Dict[Optional[str], Future]) -> Dict[Optional[str], object]:
+    # Results of the domains that finished; one that failed (e.g. an index that will not load) is
+    # logged and left out, like one still running at the deadline.
+    results = {}
+    for domain, future in futures.items():
+        if not future.done():
+            continue
+        error = future.exception()
+        if error is not None:
+            LOGGER.warning("Search over domain %s failed; merging the others", domain, exc_info=error)
+            continue
+        results[domain] = future.result()
+    return results
+
+
+def _use_ann(index: Dict) -> bool:
+    return config.RAG_ANN_PROBES > 0 and "ann" in index
+
+
+def _use_docs(index: Dict) -> bool:
+    return config.RAG_DOC_CANDIDATES > 0 and "docs" in index
+
+
+def _score_vector(index: Dict, query_vec, top_k: int) -> Scored:
+    if _use_ann(index):
+        return (index,) + ann_top_k(query_vec, index, top_k, config.RAG_ANN_PROBES)
+    if _use_docs(index):
+        return (index,) + doc_top_k(query_vec, index, top_k, config.RAG_DOC_CANDIDATES)
+
+    def score(shard: Dict):
+        ranked, scores = top_k_scores(query_vec, shard["postings"], top_k)
+        return ranked + shard["offset"], scores
+
+    parts = _map_shards(score, index["shards"])
+    return (index,) + merge_top_k(parts, top_k, index["n_chunks"])
+
+
+def _score_index(query: str, top_k: int, domain: Optional[str]) -> Scored:
+    index = _load_index(domain)
+    return _score_vector(index, index["vectorizer"].transform([query]), top_k)
+
+
+def _score_many_index(queries: List[str], top_k: int, domain: Optional[str]) -> List[Scored]:
+    index = _load_index(domain)
+    query_matrix = index["vectorizer"].transform(queries)
+    if _use_ann(index) or _use_docs(index):
+        return [_score_vector(index, query_matrix[row], top_k) for row in range(len(queries))]
+
+    def score(shard: Dict):
+        return [
+            (ranked + shard["offset"], scores)
+            for ranked, scores in top_k_scores_many(query_matrix, shard["postings"], top_k)
+        ]
+
+    per_shard = _map_shards(score, index["shards"])
+    results = []
+    for row in range(len(queries)):
+        parts = [shard_results[row] for shard_results in per_shard]
+        results.append((index,) + merge_top_k(parts, top_k, index["n_chunks"]))
     return results
+
+
+def _hydrate(scored: Scored) -> List[Dict]:
+    index, ranked, scores = scored
+    return _to_results(index["chunks"], ranked, scores)
+
+
+def _cache_key(query: str, top_k: int, domain: Optional[str], domains: List[Optional[str]]):
+    # Index versions are part of the key, so a rebuilt or re-downloaded index never serves stale hits.
+    versions = tuple(REGISTRY.version(d) for d in (domains or [domain]))
+    mode = (config.RAG_ANN_PROBES, config.RAG_DOC_CANDIDATES)
+    return normalize_query(query), domain, top_k, versions, mode
+
+
+def _search_uncached(
+    query: str,
+    top_k: int,
+    domain: Optional[str],
+    domains: List[Optional[str]],
+    deadline: Optional[float] = None,
+) -> List[Dict]:
+    if not domains:
+        return _hydrate(_score_index(query, top_k, domain))
+    futures = {d: _executor().submit(_score_index, query, top_k, d) for d in domains}
+    # Past the deadline, merge the domains that have finished and leave the rest behind.
+    wait(futures.values(), timeout=remaining(deadline))
+    return _merge(_finished(futures), top_k)
+
+
+def search(query: str, top_k: int = 3, domain: Optional[str] = None, deadline: Optional[float] = None) -> List[Dict]:
+    domains = _fanout_domains(domain)
+    if not CACHE.enabled:
+        return _search_uncached(query, top_k, domain, domains, deadline)
+    key = _cache_key(query, top_k, domain, domains)
+    cached = CACHE.get(key)
+    if cached is not None:
+        return cached
+    results = _search_uncached(query, top_k, domain, domains, deadline)
+    # Results cut short by the deadline may be missing a domain; don't serve them again.
+    if not expired(deadline):
+        CACHE.put(key, results)
+    return results
+
+
+async def asearch(
+    query: str, top_k: int = 3, domain: Optional[str] = None, deadline: Optional[float] = None
+) -> List[Dict]:
+    # Cache hits are answered on the event loop; scoring runs on a worker thread.
+    domains = _fanout_domains(domain)
+    if not CACHE.enabled:
+        return await asyncio.to_thread(_search_uncached, query, top_k, domain, domains, deadline)
+    key = _cache_key(query, top_k, domain, domains)
+    cached = CACHE.get(key)
+    if cached is not None:
+        return cached
+    results = await asyncio.to_thread(_search_uncached, query, top_k, domain, domains, deadline)
+    if not expired(deadline):
+        CACHE.put(key, results)
+    return results
+
+
+def cache_stats() -> Dict:
+    return CACHE.stats()
+
+
+def search_many(queries: List[str], top_k: int = 3, domain: Optional[str] = None) -> List[List[Dict]]:
+    if not queries:
+        return []
+    domains = _fanout_domains(domain)
+    if not domains:
+        return [_hydrate(scored) for scored in _score_many_index(queries, top_k, domain)]
+    futures = {d: _executor().submit(_score_many_index, queries, top_k, d) for d in domains}
+    wait(futures.values())
+    per_domain = _finished(futures)
+    return [
+        _merge({d: results[i] for d, results in per_domain.items()}, top_k)
+        for i in range(len(queries))
+    ]
+
+
+def _search_many_cached(queries: List[str], top_k: int, domain: Optional[str]) -> List[List[Dict]]:
+    domains = _fanout_domains(domain)
+    keys = [_cache_key(query, top_k, domain, domains) for query in queries]
+    results: List[Optional[List[Dict]]] = [CACHE.get(key) if CACHE.enabled else None for key in keys]
+    # Misses are scored in one pass, each distinct query once.
+    missing: Dict[Tuple, str] = {}
+    for key, query, cached in zip(keys, queries, results):
+        if cached is None:
+            missing.setdefault(key, query)
+    scored = dict(zip(missing, search_many(list(missing.values()), top_k, domain)))
+    for key, hits in scored.items():
+        CACHE.put(key, hits)
+    return [cached if cached is not None else [dict(r) for r in scored[key]] for key, cached in zip(keys, results)]
+
+
+async def asearch_many(queries: List[str], top_k: int = 3, domain: Optional[str] = None) -> List[List[Dict]]:
+    # search() results for each query, with the cache misses vectorized and scored together.
+    return await asyncio.to_thread(_search_many_cached, queries, top_k, domain)
@@ -0,0 +1,152 @@
+import math
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+from tools.sentences import split_sentences, tokenize
+
+
+# A scorer gets the query terms, the candidate pool and a perf_counter() deadline, and returns
+# one score per candidate, or None once the deadline has passed.
+Scorer = Callable[[List[str], List[Dict], float], Optional[List[float]]]
+RERANKERS: Dict[str, Scorer] = {}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+SENTENCE_WEIGHT = 1.0
+CHUNK_WEIGHT = 0.3
+PROXIMITY_WEIGHT = 0.5
+
+
+def register_reranker(name: str, scorer: Scorer) -> None:
+    RERANKERS[name] = scorer
+
+
+# One candidate's text as the scorer sees it: the token length of each sentence, and (sentence,
+# position, term number) for every token that is a query term, in reading order.
+TermMatches = Tuple[List[int], List[Tuple[int, int, int]]]
+
+
+def _term_matches(candidate: Dict, terms: List[str]) -> TermMatches:
+    sentences = candidate.get("sentences")
+    found = sentences.term_matches(terms) if sentences is not None else None
+    if found is not None:
+        lengths, matches = found
+        return lengths.tolist(), matches
+    # Legacy pickles and indexes written without re-ranking data: split and tokenize the text.
+    numbers = {term: number for number, term in enumerate(terms)}
+    lengths, matches = [], []
+    for sentence in split_sentences(candidate.get("text", "")):
+        tokens = tokenize(sentence)
+        if not tokens:
+            continue
+        matches.extend((len(lengths), pos, numbers[token]) for pos, token in enumerate(tokens) if token in numbers)
+        lengths.append(len(tokens))
+    return lengths, matches
+
+
+def _idf(n_terms: int, docs: List[TermMatches]) -> List[float]:
+    n_docs = len(docs)
+    df = Counter()
+    for _, matches in docs:
+        df.update({number for _, _, number in matches})
+    return [math.log(1 + (n_docs - df[number] + 0.5) / (df[number] + 0.5)) for number in range(n_terms)]
+
+
+def _proximity(positions: List[Tuple[int, int]], length: int) -> float:
+    # Matched distinct terms over the shortest window that covers all of them.
+    present = len({number for _, number in positions})
+    if present < 2:
+        return 0.0
+    best = length
+    counts: Counter = Counter()
+    covered = 0
+    left = 0
+    for pos, number in positions:
+        counts[number] += 1
+        covered += counts[number] == 1
+        while covered == present:
+            left_pos, left_number = positions[left]
+            best = min(best, pos - left_pos + 1)
+            counts[left_number] -= 1
+            covered -= counts[left_number] == 0
+            left += 1
+    return present / best
+
+
+def bm25f_scores(query_terms: List[str], candidates: List[Dict], deadline: float) -> Optional[List[float]]:
+    terms = list(dict.fromkeys(query_terms))
+    docs = []
+    for candidate in candidates:
+        if time.perf_counter() > deadline:
+            return None
+        docs.append(_term_matches(candidate, terms))
+
+    idf = _idf(len(terms), docs)
+    n_sentences = sum(len(lengths) for lengths, _ in docs) or 1
+    avg_sentence = sum(sum(lengths) for lengths, _ in docs) / n_sentences or 1.0
+    avg_chunk = sum(sum(lengths) for lengths, _ in docs) / len(docs) or 1.0
+
+    scores = []
+    for lengths, matches in docs:
+        if time.perf_counter() > deadline:
+            return None
+        chunk_tf = Counter(number for _, _, number in matches)
+        chunk_norm = 1 - BM25_B + BM25_B * sum(lengths) / avg_chunk
+        by_sentence: Dict[int, List[Tuple[int, int]]] = {}
+        for sentence, pos, number in matches:
+            by_sentence.setdefault(sentence, []).append((pos, number))
+        best = 0.0
+        # BM25F with two fields per sentence span: the sentence itself and its whole chunk.
+        for sentence, positions in by_sentence.items():
+            sentence_tf = Counter(number for _, number in positions)
+            sentence_norm = 1 - BM25_B + BM25_B * lengths[sentence] / avg_sentence
+            score = 0.0
+            for number, weight in enumerate(idf):
+                tf = SENTENCE_WEIGHT * sentence_tf[number] / sentence_norm
+                tf += CHUNK_WEIGHT * chunk_tf[number] / chunk_norm
+                score += weight * tf / (BM25_K1 + tf)
+            best = max(best, score + PROXIMITY_WEIGHT * _proximity(positions, lengths[sentence]))
+        scores.append(best)
+    return scores
+
+
+register_reranker("bm25f", bm25f_scores)
+
+
+def candidate_pool(top_k: int) -> int:
+    if config.RERANKER not in RERANKERS:
+        return top_k
+    return max(top_k, config.RERANK_CANDIDATES)
+
+
+def rerank(query: str, candidates: List[Dict], top_k: int, deadline: Optional[float] = None) -> Tuple[List[Dict], Dict]:
+    start = time.perf_counter()
+    # The per-request deadline can only shorten the re-rank budget.
+    budget = start + config.RERANK_BUDGET_MS / 1000
+    if deadline is not None:
+        budget = min(budget, deadline)
+    pool = candidates[: max(top_k, config.RERANK_CANDIDATES)]
+    stats = {
+        "reranker": config.RERANKER,
+        "candidates": len(pool),
+        "applied": False,
+        "budget_exceeded": False,
+        "elapsed_ms": 0.0,
+    }
+    scorer = RERANKERS.get(config.RERANKER)
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    scores = None
+    if scorer is not None and len(pool) > 1 and query_terms:
+        scores = scorer(query_terms, pool, budget)
+        stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        stats["budget_exceeded"] = scores is None
+    if scores is None:
+        # Disabled, nothing to reorder, or over budget: keep the first-pass order.
+        return candidates[:top_k], stats
+
+    # sorted() is stable, so equal scores keep their first-pass order.
+    order = sorted(range(len(pool)), key=lambda i: -scores[i])
+    stats["applied"] = True
+    return [dict(pool[i], rerank_score=scores[i]) for i in order[:top_k]], stats
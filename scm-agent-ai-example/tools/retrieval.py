@@ -0,0 +1,148 @@
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
+
+
+def build_postings(matrix):
+    postings = matrix.tocsc()
+    postings.sort_indices()
+    return postings
+
+
+def with_shards(index: Dict) -> Dict:
+    if "shards" not in index:
+        matrix = index.pop("matrix")
+        index["shards"] = [{"offset": 0, "matrix": matrix, "postings": build_postings(matrix)}]
+        index["n_chunks"] = matrix.shape[0]
+    return index
+
+
+def _accumulate(query_vec, postings) -> Tuple[np.ndarray, np.ndarray]:
+    # Walk only the posting lists of the query's non-zero terms.
+    doc_parts = []
+    score_parts = []
+    for term, weight in zip(query_vec.indices, query_vec.data):
+        start, end = postings.indptr[term], postings.indptr[term + 1]
+        if start == end:
+            continue
+        doc_parts.append(postings.indices[start:end])
+        score_parts.append(postings.data[start:end] * weight)
+    if not doc_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    doc_ids, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+    scores = np.bincount(inverse, weights=np.concatenate(score_parts), minlength=len(doc_ids))
+    return doc_ids.astype(np.int64), scores
+
+
+def select_top_k(
+    doc_ids: np.ndarray, scores: np.ndarray, top_k: int, n_docs: int, pad: bool = True
+) -> Tuple[np.ndarray, np.ndarray]:
+    if top_k <= 0:
+        return doc_ids[:0], scores[:0]
+    # Ordering matches a stable argsort()[::-1]: score descending, then higher chunk index first.
+    if len(scores) > top_k:
+        part = np.argpartition(-scores, top_k - 1)[:top_k]
+        threshold = scores[part].min()
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)
+        chosen = np.concatenate([above, ties[len(ties) - (top_k - len(above)) :]])
+        doc_ids, scores = doc_ids[chosen], scores[chosen]
+    order = np.lexsort((-doc_ids, -scores))
+    doc_ids, scores = doc_ids[order], scores[order]
+
+    # Chunks that share no term with the query still fill the page, as the dense ranking did.
+    missing = min(top_k, n_docs) - len(doc_ids)
+    if pad and missing > 0:
+        touched = set(doc_ids.tolist())
+        padding = []
+        candidate = n_docs - 1
+        while len(padding) < missing:
+            if candidate not in touched:
+                padding.append(candidate)
+            candidate -= 1
+        doc_ids = np.concatenate([doc_ids, np.asarray(padding, dtype=np.int64)])
+        scores = np.concatenate([scores, np.zeros(len(padding))])
+    return doc_ids, scores
+
+
+def _query_norms(query_matrix) -> np.ndarray:
+    norms = np.sqrt(np.asarray(query_matrix.multiply(query_matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return norms
+
+
+def top_k_scores(query_vec, postings, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    query_vec = query_vec.tocsr()
+    doc_ids, scores = _accumulate(query_vec, postings)
+    return select_top_k(doc_ids, scores / _query_norms(query_vec)[0], top_k, postings.shape[0])
+
+
+def top_k_scores_many(query_matrix, postings, top_k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    # One sparse product scores every query; each row only holds the chunks its terms touched.
+    query_matrix = query_matrix.tocsr()
+    product = (query_matrix @ postings.T).tocsr()
+    product.sort_indices()
+    norms = _query_norms(query_matrix)
+    results = []
+    for row in range(product.shape[0]):
+        start, end = product.indptr[row], product.indptr[row + 1]
+        doc_ids = product.indices[start:end].astype(np.int64)
+        scores = product.data[start:end] / norms[row]
+        results.append(select_top_k(doc_ids, scores, top_k, postings.shape[0]))
+    return results
+
+
+def merge_top_k(
+    parts: List[Tuple[np.ndarray, np.ndarray]], top_k: int, n_docs: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    if len(parts) == 1:
+        return parts[0]
+    doc_ids = np.concatenate([ids for ids, _ in parts])
+    scores = np.concatenate([s for _, s in parts])
+    return select_top_k(doc_ids, scores, top_k, n_docs)
+
+
+def rescore(query_vec, shards: List[Dict], doc_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Exact cosine for the candidate chunks only, read from the sparse shard rows.
+    query_vec = query_vec.tocsr()
+    norm = math.sqrt(float(query_vec.multiply(query_vec).sum())) or 1.0
+    offsets = np.asarray([shard["offset"] for shard in shards])
+    owners = np.searchsorted(offsets, doc_ids, side="right") - 1
+    id_parts, score_parts = [], []
+    for number in np.unique(owners):
+        shard = shards[number]
+        global_ids = doc_ids[owners == number]
+        rows = shard["matrix"][global_ids - shard["offset"]]
+        scores = np.asarray((rows @ query_vec.T).todense()).ravel() / norm
+        keep = scores > 0
+        id_parts.append(global_ids[keep])
+        score_parts.append(scores[keep])
+    if not id_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    return np.concatenate(id_parts), np.concatenate(score_parts)
+
+
+def build_doc_matrix(matrix, doc_chunk_ptr: np.ndarray):
+    # A document vector is the normalized sum of its chunk vectors, in the same vocabulary.
+    n_docs = len(doc_chunk_ptr) - 1
+    membership = csr_matrix(
+        (np.ones(matrix.shape[0]), np.arange(matrix.shape[0]), doc_chunk_ptr),
+        shape=(n_docs, matrix.shape[0]),
+    )
+    return normalize(membership @ matrix).tocsr()
+
+
+def doc_top_k(query_vec, index: Dict, top_k: int, doc_candidates: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Stage one ranks whole documents; stage two scores only the chunks of the best ones.
+    docs = index["docs"]
+    query_vec = query_vec.tocsr()
+    ptr = docs["chunk_ptr"]
+    doc_ids, doc_scores = _accumulate(query_vec, docs["postings"])
+    doc_ids, _ = select_top_k(doc_ids, doc_scores, doc_candidates, len(ptr) - 1, pad=False)
+    ranges = [np.arange(ptr[d], ptr[d + 1]) for d in np.sort(doc_ids)]
+    candidates = np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+    chunk_ids, scores = rescore(query_vec, index["shards"], candidates)
+    return select_top_k(chunk_ids, scores, top_k, index["n_chunks"])
@@ -0,0 +1,161 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+_FLUSH = object()
+_STOP = object()
+
+
+class RunLogger:
+    # Requests only enqueue; one background thread batches payloads into the JSONL file.
+    # Rotation assumes this logger is the file's only writer: give each process its own path.
+    def __init__(
+        self,
+        path: Path,
+        max_queue: int = 10000,
+        batch_size: int = 256,
+        flush_seconds: float = 1.0,
+        max_bytes: int = 50 * 2**20,
+        backups: int = 10,
+    ) -> None:
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, max_queue))
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._atexit = False
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+
+    def log(self, payload: Dict) -> bool:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            # Backpressure drops the entry instead of stalling the request.
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def flush(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def stats(self) -> Dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "errors": self.errors,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="run-logger", daemon=True)
+                self._thread.start()
+                if not self._atexit:
+                    # The thread is a daemon; flush what is queued when the interpreter exits.
+                    atexit.register(self.close)
+                    self._atexit = True
+
+    def _next_batch(self) -> List:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size and batch[-1] not in (_FLUSH, _STOP):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = self._next_batch()
+            stopping = batch[-1] is _STOP
+            payloads = [item for item in batch if item is not _FLUSH and item is not _STOP]
+            try:
+                if payloads:
+                    self._write(payloads)
+            except Exception:
+                self.errors += 1
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, payloads: List[Dict]) -> None:
+        data = "".join(json.dumps(p, ensure_ascii=True) + "\n" for p in payloads).encode("utf-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._rotate_if_needed(len(data))
+        with self.path.open("ab") as f:
+            f.write(data)
+        self.written += len(payloads)
+
+    def _rotate_if_needed(self, incoming: int) -> None:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return
+        if stat.st_size == 0:
+            return
+        file_date = date.fromtimestamp(stat.st_mtime)
+        too_big = self.max_bytes > 0 and stat.st_size + incoming > self.max_bytes
+        if file_date == date.today() and not too_big:
+            return
+        # Rotated files are named by the day they were written: scm_runs.2024-05-01.1.jsonl.
+        prefix = f"{self.path.stem}.{file_date.isoformat()}."
+        taken = [p.name[len(prefix) : -len(self.path.suffix) or None] for p in self._rotated(prefix)]
+        number = max((int(n) for n in taken if n.isdigit()), default=0) + 1
+        try:
+            os.replace(self.path, self.path.with_name(f"{prefix}{number}{self.path.suffix}"))
+        except FileNotFoundError:
+            # Moved away since the stat() (another writer rotated it): the batch starts a new file.
+            return
+        self.rotations += 1
+        if self.backups > 0:
+            rotated = sorted(self._rotated(f"{self.path.stem}."), key=_mtime)
+            for old in rotated[: -self.backups]:
+                old.unlink(missing_ok=True)
+
+    def _rotated(self, prefix: str) -> List[Path]:
+        return [
+            p
+            for p in self.path.parent.glob(f"{prefix}*{self.path.suffix}")
+            if p != self.path
+        ]
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
@@ -0,0 +1,169 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tools.sentences import SENTENCE_SPLIT, tokenize
+
+
+SENTENCE_VOCAB_FILE = "sentence_vocab.txt"
+SENTENCE_ARRAY_FILES = {
+    "ranges": "sentence_ranges.npy",
+    "spans": "sentence_spans.npy",
+    "token_ptr": "sentence_token_ptr.npy",
+    "tokens": "sentence_tokens.npy",
+}
+# Each chunk's own text (not its page), sentence by sentence, as token ids in order: what the re-ranker scores.
+TEXT_SENTENCE_ARRAY_FILES = {
+    "ranges": "text_sentence_ranges.npy",
+    "token_ptr": "text_sentence_token_ptr.npy",
+    "tokens": "text_sentence_tokens.npy",
+}
+
+
+def context_text(chunk: Dict) -> str:
+    # The text answer extraction reads: the whole page when the chunk has one.
+    return chunk.get("page_text") or chunk.get("text", "")
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    # The pieces splitting the whitespace-normalized text would give, located in the raw text.
+    start = len(text) - len(text.lstrip())
+    end = len(text.rstrip())
+    spans = []
+    for match in SENTENCE_SPLIT.finditer(text, start, end):
+        spans.append((start, match.start()))
+        start = match.end()
+    if start < end:
+        spans.append((start, end))
+    return spans
+
+
+def build_sentence_index(
+    contexts: Iterable[str], texts: Iterable[str]
+) -> Tuple[List[str], Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    vocab: Dict[str, int] = {}
+    ranges: List[Tuple[int, int]] = []
+    spans: List[Tuple[int, int]] = []
+    token_ptr = [0]
+    tokens: List[int] = []
+    # Chunks of one page share its text; their sentences are stored once.
+    seen: Dict[str, Tuple[int, int]] = {}
+    for text in contexts:
+        sentence_range = seen.get(text)
+        if sentence_range is None:
+            first = len(spans)
+            for start, end in sentence_spans(text):
+                ids = sorted({vocab.setdefault(token, len(vocab)) for token in tokenize(text[start:end])})
+                if not ids:
+                    continue
+                spans.append((start, end))
+                tokens.extend(ids)
+                token_ptr.append(len(tokens))
+            sentence_range = seen[text] = (first, len(spans))
+        ranges.append(sentence_range)
+
+    text_ranges: List[Tuple[int, int]] = []
+    text_ptr = [0]
+    text_tokens: List[int] = []
+    seen = {}
+    for text in texts:
+        sentence_range = seen.get(text)
+        if sentence_range is None:
+            first = len(text_ptr) - 1
+            for start, end in sentence_spans(text):
+                ids = [vocab.setdefault(token, len(vocab)) for token in tokenize(text[start:end])]
+                if ids:
+                    text_tokens.extend(ids)
+                    text_ptr.append(len(text_tokens))
+            sentence_range = seen[text] = (first, len(text_ptr) - 1)
+        text_ranges.append(sentence_range)
+
+    terms = [""] * len(vocab)
+    for term, token_id in vocab.items():
+        terms[token_id] = term
+    arrays = {
+        "ranges": np.asarray(ranges, dtype=np.int64).reshape(-1, 2),
+        "spans": np.asarray(spans, dtype=np.int64).reshape(-1, 2),
+        "token_ptr": np.asarray(token_ptr, dtype=np.int64),
+        "tokens": np.asarray(tokens, dtype=np.int32),
+    }
+    text_arrays = {
+        "ranges": np.asarray(text_ranges, dtype=np.int64).reshape(-1, 2),
+        "token_ptr": np.asarray(text_ptr, dtype=np.int64),
+        "tokens": np.asarray(text_tokens, dtype=np.int32),
+    }
+    return terms, arrays, text_arrays
+
+
+class SentenceIndex:
+    def __init__(
+        self, terms: Sequence[str], arrays: Dict[str, np.ndarray], text_arrays: Optional[Dict[str, np.ndarray]] = None
+    ) -> None:
+        self._vocab = {term: token_id for token_id, term in enumerate(terms)}
+        self._ranges = arrays["ranges"]
+        self._spans = arrays["spans"]
+        self._token_ptr = arrays["token_ptr"]
+        self._tokens = arrays["tokens"]
+        # Indexes written before the re-ranker's sentence data existed have none.
+        self._text = text_arrays
+
+    def term_matches(self, row: int, terms: Sequence[str]) -> Optional[Tuple[np.ndarray, List[Tuple[int, int, int]]]]:
+        # Sentence lengths (in tokens) of the chunk's own text, and (sentence, position, term number)
+        # for every token that is one of `terms`; None when the index has no such data.
+        if self._text is None:
+            return None
+        first, last = (int(i) for i in self._text["ranges"][row])
+        ptr = np.asarray(self._text["token_ptr"][first : last + 1])
+        if first == last:
+            return np.zeros(0, dtype=np.int64), []
+        lookup = {self._vocab[term]: number for number, term in enumerate(terms) if term in self._vocab}
+        if not lookup:
+            return np.diff(ptr), []
+        tokens = np.asarray(self._text["tokens"][ptr[0] : ptr[-1]])
+        positions = np.flatnonzero(np.isin(tokens, np.fromiter(lookup, dtype=np.int32, count=len(lookup))))
+        sentences = np.searchsorted(ptr, positions + ptr[0], side="right") - 1
+        matches = [
+            (int(sentence), int(pos + ptr[0] - ptr[sentence]), lookup[int(tokens[pos])])
+            for sentence, pos in zip(sentences, positions)
+        ]
+        return np.diff(ptr), matches
+
+    def token_ids(self, tokens: Iterable[str]) -> np.ndarray:
+        ids = {self._vocab[token] for token in tokens if token in self._vocab}
+        return np.fromiter(ids, dtype=np.int32, count=len(ids))
+
+    def match(
+        self, row: int, token_ids: np.ndarray, limit: Optional[int] = None
+    ) -> Tuple[List[Tuple[int, int, int]], int]:
+        # (shared token count, start, end) of each sentence that shares a query token and ends
+        # within `limit` characters, plus where the last stored sentence within the limit ends.
+        first, last = (int(i) for i in self._ranges[row])
+        if limit is not None:
+            last = first + int(np.searchsorted(self._spans[first:last, 1], limit, side="right"))
+        covered = int(self._spans[last - 1][1]) if last > first else 0
+        if first == last or not len(token_ids):
+            return [], covered
+        starts = np.asarray(self._token_ptr[first : last + 1])
+        hits = np.isin(self._tokens[starts[0] : starts[-1]], token_ids).astype(np.int32)
+        counts = np.add.reduceat(hits, starts[:-1] - starts[0])
+        matches = [
+            (int(counts[i]), int(self._spans[first + i][0]), int(self._spans[first + i][1]))
+            for i in np.flatnonzero(counts)
+        ]
+        return matches, covered
+
+
+class SentenceRef:
+    # Points a search hit at its chunk's precomputed sentences.
+    def __init__(self, index: SentenceIndex, row: int) -> None:
+        self.index = index
+        self.row = row
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, SentenceRef) and (other.index, other.row) == (self.index, self.row)
+
+    def match(self, tokens: Iterable[str], limit: Optional[int] = None) -> Tuple[List[Tuple[int, int, int]], int]:
+        return self.index.match(self.row, self.index.token_ids(tokens), limit)
+
+    def term_matches(self, terms: Sequence[str]) -> Optional[Tuple[np.ndarray, List[Tuple[int, int, int]]]]:
+        return self.index.term_matches(self.row, terms)
@@ -0,0 +1,91 @@
+import re
+from typing import List
+
+
+STOPWORDS = {
+    "the",
+    "a",
+    "an",
+    "and",
+    "or",
+    "to",
+    "of",
+    "for",
+    "in",
+    "on",
+    "with",
+    "is",
+    "are",
+    "was",
+    "were",
+    "be",
+    "this",
+    "that",
+    "these",
+    "those",
+    "it",
+    "as",
+    "at",
+    "by",
+    "from",
+    "what",
+    "how",
+    "why",
+    "when",
+    "which",
+    "who",
+    "where",
+    "i",
+    "we",
+    "you",
+    "your",
+    "our",
+    "and/or",
+    "about",
+    "into",
+    "than",
+    "also",
+    "can",
+    "could",
+    "should",
+    "would",
+    "may",
+    "might",
+    "do",
+    "does",
+    "did",
+    "done",
+    "안",
+    "이",
+    "그",
+    "저",
+    "것",
+    "수",
+    "하는",
+    "하기",
+    "되",
+    "된다",
+    "될",
+    "좀",
+    "좀더",
+    "방법",
+    "어떻게",
+    "무엇",
+    "뭐",
+    "설명",
+    "알려줘",
+    "알려",
+    "해주세요",
+    "해줘",
+}
+TOKEN_PATTERN = re.compile(r"[a-zA-Z0-9가-힣]+")
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def tokenize(text: str) -> List[str]:
+    # Same tokens as splitting on [^a-zA-Z0-9가-힣]+, without the empty pieces.
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def split_sentences(text: str) -> List[str]:
+    return SENTENCE_SPLIT.split(text)
@@ -0,0 +1,53 @@
+import hashlib
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Tuple
+
+import numpy as np
+
+
+class TextStoreWriter:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file: BinaryIO = path.open("wb")
+        self._size = 0
+        self._spans: Dict[bytes, Tuple[int, int]] = {}
+
+    def append(self, text: str) -> Tuple[int, int]:
+        data = text.encode("utf-8")
+        if not data:
+            return 0, 0
+        # Identical payloads (a page's text repeated on each of its chunks) are stored once.
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        span = self._spans.get(digest)
+        if span is None:
+            self._file.write(data)
+            span = (self._size, self._size + len(data))
+            self._size += len(data)
+            self._spans[digest] = span
+        return span
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class TextStore:
+    def __init__(self, path: Path, spans: np.ndarray) -> None:
+        size = path.stat().st_size
+        self._data = np.memmap(path, dtype=np.uint8, mode="r") if size else np.empty(0, np.uint8)
+        self._spans = spans
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def get(self, slot: int) -> str:
+        start, end = self._spans[slot]
+        return self._data[int(start) : int(end)].tobytes().decode("utf-8")
+
+
+def write_text_store(path: Path, texts: List[str]) -> np.ndarray:
+    writer = TextStoreWriter(path)
+    try:
+        spans = [writer.append(text) for text in texts]
+    finally:
+        writer.close()
+    return np.asarray(spans, dtype=np.int64).reshape(-1, 2)
@@ -0,0 +1,118 @@
+import heapq
+import re
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+
+WORD_PATTERN = re.compile(r"[^\s?!.,;:()\"']+")
+
+
+def _trigrams(text: str) -> Set[str]:
+    # Padded so short keys ("po", "재고") and word edges still produce trigrams.
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    # Inverted indexes over dictionary keys, so fuzzy matching only scores keys that can pass the cutoff.
+    # close_matches() returns exactly what difflib.get_close_matches would; span_matches() is approximate.
+    def __init__(self, keys: List[str]) -> None:
+        self.keys = keys
+        self._sizes: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        for key_id, key in enumerate(keys):
+            grams = _trigrams(key)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(key_id)
+        self._max_words = max((len(WORD_PATTERN.findall(key)) for key in keys), default=0)
+
+        # Keys bucketed by length: slot i holds key _by_length[i], shortest first, so every length band
+        # is one contiguous range of slots. Character postings list (slot, count) in slot order.
+        self._by_length = np.argsort(np.asarray([len(key) for key in keys], dtype=np.int64), kind="stable")
+        self._slot_lengths = np.asarray([len(keys[key_id]) for key_id in self._by_length], dtype=np.int64)
+        char_postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        for slot, key_id in enumerate(self._by_length):
+            for char, count in Counter(keys[key_id]).items():
+                slots, counts = char_postings.setdefault(char, ([], []))
+                slots.append(slot)
+                counts.append(count)
+        self._char_postings = {
+            char: (np.asarray(slots, dtype=np.int64), np.asarray(counts, dtype=np.int64))
+            for char, (slots, counts) in char_postings.items()
+        }
+
+    def _bounded(self, text: str, cutoff: float) -> List[int]:
+        # Keys that can reach ratio >= cutoff, the two bounds difflib checks first. real_quick_ratio
+        # limits the key length to [cutoff / (2 - cutoff), (2 - cutoff) / cutoff] times the text's;
+        # quick_ratio needs 2 * shared characters >= cutoff * (both lengths). Both hold for every key
+        # difflib returns, so the result is exact. (A trigram bound is not: at a 0.6 cutoff a key can
+        # match with no trigram in common, "jit" for "itf".) Only postings inside the band are read.
+        size = len(text)
+        if size == 0:
+            return []
+        if cutoff <= 0:
+            return list(range(len(self.keys)))
+        # Slack of one character either side keeps float rounding from dropping a boundary key.
+        low = np.searchsorted(self._slot_lengths, cutoff * size / (2 - cutoff) - 1, side="left")
+        high = np.searchsorted(self._slot_lengths, (2 - cutoff) * size / cutoff + 1, side="right")
+        if low >= high:
+            return []
+        shared = np.zeros(high - low)
+        for char, count in Counter(text).items():
+            posting = self._char_postings.get(char)
+            if posting is None:
+                continue
+            slots, counts = posting
+            start, stop = np.searchsorted(slots, (low, high))
+            weights = np.minimum(counts[start:stop], count)
+            shared += np.bincount(slots[start:stop] - low, weights=weights, minlength=high - low)
+        passed = np.nonzero(2 * shared >= cutoff * (size + self._slot_lengths[low:high]) - 1e-9)[0]
+        return self._by_length[passed + low].tolist()
+
+    def _candidates(self, text: str, min_dice: float) -> List[int]:
+        # Keys sharing enough trigrams with the text. Cheaper than _bounded() but lossy: a typo that
+        # breaks most trigrams of a short key ("bsrop" for "s&op") drops a key difflib would keep.
+        grams = _trigrams(text)
+        shared: Dict[int, int] = {}
+        postings, sizes = self._postings, self._sizes
+        for gram in grams:
+            for key_id in postings.get(gram, ()):
+                shared[key_id] = shared.get(key_id, 0) + 1
+        size = len(grams)
+        return [key_id for key_id, count in shared.items() if 2 * count >= min_dice * (size + sizes[key_id])]
+
+    def _scored(self, text: str, candidates: List[int], cutoff: float) -> List[Tuple[float, str]]:
+        # Same scoring as difflib.get_close_matches, over the candidates only.
+        if not candidates:
+            return []
+        matcher = SequenceMatcher()
+        matcher.set_seq2(text)
+        scored = []
+        for key_id in candidates:
+            matcher.set_seq1(self.keys[key_id])
+            if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+                ratio = matcher.ratio()
+                if ratio >= cutoff:
+                    scored.append((ratio, self.keys[key_id]))
+        return scored
+
+    def close_matches(self, text: str, n: int = 3, cutoff: float = 0.6) -> List[str]:
+        return [key for _, key in heapq.nlargest(n, self._scored(text, self._bounded(text, cutoff), cutoff))]
+
+    def span_matches(self, text: str, n: int = 3, cutoff: float = 0.85, min_dice: float = 0.5) -> List[str]:
+        # Keys matching a run of words inside the text ("otif" in "define otif for executives").
+        # Windows are many, so they use the trigram prefilter and may miss heavily misspelled keys.
+        words = WORD_PATTERN.findall(text)
+        best: Dict[str, float] = {}
+        for size in range(1, min(self._max_words, len(words)) + 1):
+            for start in range(len(words) - size + 1):
+                window = " ".join(words[start : start + size])
+                if len(window) < 3:
+                    continue
+                for ratio, key in self._scored(window, self._candidates(window, min_dice), cutoff):
+                    best[key] = max(ratio, best.get(key, 0.0))
+        return [key for key, _ in heapq.nlargest(n, best.items(), key=lambda item: (item[1], item[0]))]
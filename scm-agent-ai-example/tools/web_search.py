@@ -1,27 +1,62 @@
 import html
 import re
 import urllib.parse
-import urllib.request
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+import config
+from tools.http_pool import HttpPool
 
 
 USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
 
 
-def _fetch(url: str, timeout: int = 8) -> str:
-    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return resp.read().decode("utf-8", errors="ignore")
+POOL = HttpPool(
+    config.WEB_POOL_SIZE,
+    config.WEB_POOL_PER_HOST,
+    config.WEB_KEEPALIVE_SECONDS,
+    headers={"User-Agent": USER_AGENT},
+)
+
+
+def _timeout(timeout: Optional[float]) -> float:
+    # A caller's remaining budget can only shorten the configured timeout.
+    if timeout is None:
+        return config.WEB_SEARCH_TIMEOUT_SECONDS
+    return min(timeout, config.WEB_SEARCH_TIMEOUT_SECONDS)
+
+
+def _fetch(url: str, timeout: Optional[float] = None) -> str:
+    # Pooled keep-alive connection: repeat fallbacks skip the TCP and TLS handshakes.
+    return POOL.get(url, _timeout(timeout))
+
+
+def _search_url(query: str) -> str:
+    # WEB_SEARCH_URL points at DuckDuckGo's HTML endpoint, or any server returning the same markup.
+    return f"{config.WEB_SEARCH_URL}?q={urllib.parse.quote_plus(query)}"
+
 
+async def _afetch(url: str, timeout: Optional[float] = None) -> str:
+    return await POOL.aget(url, _timeout(timeout))
 
-def web_search(query: str, max_results: int = 3) -> List[Dict]:
+
+def web_search(query: str, max_results: int = 3, timeout: Optional[float] = None) -> List[Dict]:
     try:
-        encoded = urllib.parse.quote_plus(query)
-        url = f"https://duckduckgo.com/html/?q={encoded}"
-        html_text = _fetch(url)
+        html_text = _fetch(_search_url(query), timeout)
     except Exception:
         return []
+    return _parse_results(html_text, max_results)
+
+
+async def aweb_search(query: str, max_results: int = 3, timeout: Optional[float] = None) -> List[Dict]:
+    # Same results as web_search, without holding a thread while the request is in flight.
+    try:
+        html_text = await _afetch(_search_url(query), timeout)
+    except Exception:
+        return []
+    return _parse_results(html_text, max_results)
+
 
+def _parse_results(html_text: str, max_results: int) -> List[Dict]:
     results: List[Dict] = []
     for match in re.finditer(r'class="result__a"\s+href="([^"]+)"[^>]*>(.*?)</a>', html_text):
         link = html.unescape(match.group(1))